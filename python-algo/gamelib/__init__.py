@@ -16,14 +16,28 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
-util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+The ActionSimulator class in simulator.py plays out an action phase without the game engine, and BatchSimulator compares many deploy plans at once. 
+Investigating it is useful for players who want to compare deploys before submitting them. \n
+
+The PlanSearch class in search.py scores candidate build and deploy plans with simulated action phases, optionally on a worker pool, and returns the best one found before a deadline. \n
+
+The BoardTracker class in board.py keeps the structures on the board up to date from action frames, and reports what changed each turn. \n
+
+The UnitTable class in unit_table.py holds the units of a GameMap as NumPy columns, for queries such as the total cost of the enemy's structures. Get one with game_map.unit_table(). \n
+
+util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write(), and debug_log, a leveled debug log that is written out once per turn.
 """
 
-from .algocore import AlgoCore
-from .util import debug_write
+from .algocore import AlgoCore, BackgroundTask
+from .util import debug_write, debug_log, parse_message, EngineMessage
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .simulator import ActionSimulator, BatchSimulator
+from .search import Plan, PlanSearch
+from .board import BoardTracker, BoardDelta
+from .diagnostics import Diagnostics
+from .unit_table import UnitTable
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "board", "diagnostics", "game_state", "game_map", "navigation", "search", "simulator", "unit", "unit_table", "util"]
  
\ No newline at end of file
@@ -1,19 +1,116 @@
-import json
+import atexit
+import sys
+import threading
+import time
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .board import BoardTracker
+from .unit import compile_unit_specs
+from .util import get_command, debug_write, BANNER_TEXT, send_command, EngineMessage, decode_field, json_loads, debug_log
+
+class BackgroundTask(object):
+    """
+    Runs a function on a daemon thread until it returns or is cancelled. \n
+    The function is called with the task as its first argument, and should call task.checkpoint()
+    between chunks of work and return whatever it has so far once it returns True.
+
+    Attributes :
+        * cancelled (threading.Event): Set when the result is no longer wanted
+
+    """
+    def __init__(self, target, *args):
+        self.cancelled = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(target, args), name="algo-background", daemon=True)
+        self._thread.start()
+
+    def _run(self, target, args):
+        try:
+            self._result = target(self, *args)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def done(self):
+        """Returns True once the function has returned or raised
+        """
+        return self._done.is_set()
+
+    def checkpoint(self):
+        """Lets the main thread run if it is waiting for the GIL, then returns True if the task was cancelled
+
+        A pure Python function holds the GIL until the interpreter takes it away, so calling this every millisecond
+        or so keeps action frames from waiting on it and makes the handoff at the next turn immediate.
+        """
+        time.sleep(0)
+        return self.cancelled.is_set()
+
+    def cancel(self):
+        """Asks the function to stop, without waiting for it
+        """
+        self.cancelled.set()
+
+    def finish(self, timeout=0):
+        """Cancels the task and hands off its result
+
+        Args:
+            timeout: Seconds to wait for the function to return after being cancelled
+
+        Returns:
+            What the function returned, or None if it raised or didn't return in time
+
+        """
+        self.cancel()
+        if not self._done.wait(timeout):
+            debug_write("Background task did not stop within {} seconds, dropping its result".format(timeout))
+            return None
+        if self._error is not None:
+            debug_write("Background task failed: {}: {}".format(type(self._error).__name__, self._error))
+            return None
+        return self._result
+
 
 class AlgoCore(object):
     """
     This class handles communication with the game engine. \n
     algo_strategy.py subclasses it. 
 
+    Set ACTION_FRAME_EVENTS to the event kinds on_action_frame reads, like ("breach",),
+    and frames where they are all empty are skipped without being parsed.
+    Set ACTION_FRAME_FIELDS to the top level keys it reads, like ("events",),
+    and only those are parsed; the state of the message passed to on_action_frame then only has
+    turnInfo and those keys. Both default to None, which passes every frame fully parsed.
+
+    Override precompute to use the time spent waiting for the action phase; see its docstring.
+
+    Set TRACK_BOARD to keep self.board, a BoardTracker, up to date from action frames. Pass it to GameState
+    to skip parsing the structures, and read self.board.delta for the structures that changed since last turn.
+    Set VERIFY_BOARD as well to raise an AssertionError whenever the tracked board misses a change.
+
     Attributes :
         * config (JSON): json object containing information about the game
+        * skipped_frames (int): The number of action frames skipped because of ACTION_FRAME_EVENTS
+        * precomputed: What precompute returned during the last action phase, None if it didn't finish
+        * board (BoardTracker): The tracked structures if TRACK_BOARD is set, otherwise None
 
     """
+    ACTION_FRAME_EVENTS = None
+    ACTION_FRAME_FIELDS = None
+    BACKGROUND_HANDOFF_TIMEOUT = 0.05
+    BACKGROUND_SWITCH_INTERVAL = 0.0005
+    TRACK_BOARD = False
+    VERIFY_BOARD = False
+
     def __init__(self):
         self.config = None
+        self.skipped_frames = 0
+        self.precomputed = None
+        self.board = None
+        self._background = None
+        self._switch_interval = None
 
     def on_game_start(self, config):
         """
@@ -27,6 +124,7 @@ class AlgoCore(object):
         """
         This step function is called at the start of each turn.
         It is passed the current game state, which can be used to initiate a new GameState object. 
+        The game state is an EngineMessage: the JSON string from the engine, already parsed into its state attribute. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -40,9 +138,74 @@ class AlgoCore(object):
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
         They can be handled in this function. 
+        Like in on_turn, each frame is an EngineMessage, so use parse_message instead of parsing it again.
         """
         pass
 
+    def precompute(self, task, game_state):
+        """
+        This function is called on a background thread after on_turn returns, while the engine plays out the action phase.
+        It is passed a BackgroundTask and the message on_turn was given.
+        Whatever it returns is stored in self.precomputed before the next on_turn, for speculative
+        work like opponent models, paths or candidate plans. \n
+        Call task.checkpoint() between chunks of about a millisecond of work, and return partial results once it
+        returns True. While the precompute holds the GIL, the main thread can't read or handle action frames, and
+        when the next turn arrives on_turn waits up to BACKGROUND_HANDOFF_TIMEOUT seconds for it to return.
+        The interpreter's switch interval is lowered to BACKGROUND_SWITCH_INTERVAL while it runs, which bounds the wait
+        for the GIL even between checkpoints. If it overruns, its result is dropped and no precompute is started until it returns.
+        It runs alongside on_action_frame, so don't change state that on_action_frame or on_turn use without a lock.
+        By default, nothing is run.
+        """
+        return None
+
+    def _start_background(self, game_state):
+        if type(self).precompute is AlgoCore.precompute:
+            return
+        if self._background is not None:
+            # an overrun from an earlier turn still holds the thread, so don't pile another one on top of it
+            debug_log.warning("Precompute from an earlier turn is still running, skipping precompute this turn")
+            return
+        # the default 5 ms switch interval would hold up every action frame that arrives while it runs
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.BACKGROUND_SWITCH_INTERVAL))
+        self._background = BackgroundTask(self.precompute, game_state)
+
+    def _finish_background(self):
+        self.precomputed = None
+        task = self._background
+        if task is None:
+            return
+        # a task cancelled on an earlier turn is stale, its result is dropped even if it has finished since
+        if not task.cancelled.is_set():
+            self.precomputed = task.finish(self.BACKGROUND_HANDOFF_TIMEOUT)
+        if task.done():
+            self._background = None
+            sys.setswitchinterval(self._switch_interval)
+
+    def _action_frame_message(self, message, turn_info):
+        """
+        Parses the parts of an action frame declared in ACTION_FRAME_EVENTS and ACTION_FRAME_FIELDS.
+        Returns None if the frame should be skipped.
+        """
+        events = None
+        if self.ACTION_FRAME_EVENTS is not None:
+            # compact empty lists are a cheap sign there is nothing to decode
+            if all('"{}":[]'.format(kind) in message for kind in self.ACTION_FRAME_EVENTS):
+                self.skipped_frames += 1
+                return None
+            events = decode_field(message, "events")
+            if events is not None and not any(events.get(kind) for kind in self.ACTION_FRAME_EVENTS):
+                self.skipped_frames += 1
+                return None
+
+        if self.ACTION_FRAME_FIELDS is None:
+            return EngineMessage(message, json_loads(message))
+        state = {"turnInfo": turn_info}
+        for key in self.ACTION_FRAME_FIELDS:
+            value = events if key == "events" and events is not None else decode_field(message, key)
+            if value is not None:
+                state[key] = value
+        return EngineMessage(message, state)
 
     def start(self):
         """ 
@@ -52,6 +215,8 @@ class AlgoCore(object):
         The algo continues this loop until it recieves the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        # write out whatever is buffered when the algo exits or crashes
+        atexit.register(debug_log.flush)
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
@@ -61,27 +226,42 @@ class AlgoCore(object):
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
+                parsed_config = json_loads(game_state_string)
+                compile_unit_specs(parsed_config)
                 self.on_game_start(parsed_config)
+                if self.TRACK_BOARD:
+                    self.board = BoardTracker(parsed_config, self.VERIFY_BOARD)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                turn_info = decode_field(game_state_string, "turnInfo")
+                stateType = int(turn_info[0])
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    message = EngineMessage(game_state_string, json_loads(game_state_string))
+                    self._finish_background()
+                    if self.board is not None:
+                        self.board.start_turn(message.state)
+                    self.on_turn(message)
+                    debug_log.flush()
+                    self._start_background(message)
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    message = self._action_frame_message(game_state_string, turn_info)
+                    if self.board is not None:
+                        self.board.apply_frame(game_state_string, message.state.get("events") if message is not None else None)
+                    if message is not None:
+                        self.on_action_frame(message)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     debug_write("Got end state, game over. Stopping algo.")
+                    if self._background is not None:
+                        self._background.cancel()
                     break
                 else:
                     """
@@ -0,0 +1,174 @@
+import copy
+from collections import namedtuple
+
+from .unit import GameUnit
+from .util import debug_write, decode_field
+
+
+BoardDelta = namedtuple("BoardDelta", ["added", "removed", "damaged", "upgraded"])
+BoardDelta.__doc__ = """The structures that changed between two turns, each a list of [x, y] locations
+
+    * added: Structures that are new, including ones that replaced a different structure
+    * removed: Structures that are gone, including ones that were replaced
+    * damaged: Structures that are still there with less health
+    * upgraded: Structures that are still there and were upgraded
+"""
+
+STRUCTURE_INDICES = (0, 1, 2)
+REMOVE_INDEX = 6
+UPGRADE_INDEX = 7
+HEALTH_TOLERANCE = 1e-6
+
+
+class BoardTracker:
+    """Keeps the structures on the board up to date from action frame events, instead of rebuilding them every turn
+
+    Spawn, death and damage events from each action frame are applied as they arrive. When the next turn starts,
+    the tracked board is checked against the structures in the turn message, anything that differs is corrected
+    from the message, and delta holds what changed since the previous turn started.
+    GameState can take its structures from a tracker instead of parsing them, see its board argument.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * verify (bool): If True, start_turn raises an AssertionError when the tracked board differs from the turn message
+        * delta (BoardDelta): What changed between the last two turn messages
+        * corrections (int): The number of structures that had to be corrected from turn messages
+
+    """
+    def __init__(self, config, verify=False):
+        self.config = config
+        self.verify = verify
+        self.ARENA_SIZE = 28
+        self.delta = BoardDelta([], [], [], [])
+        self.corrections = 0
+        self._shorthands = [unit_information.get("shorthand") for unit_information in config["unitInformation"]]
+        self._units = {}
+        self._ids = {}
+        self._turn_start = {}
+
+    def units(self):
+        """Gets the tracked structures
+
+        Returns:
+            A list of the tracked GameUnits, ordered by location. They belong to the tracker, so copy them before changing them.
+
+        """
+        return [self._units[index] for index in sorted(self._units)]
+
+    def apply_frame(self, message, events=None):
+        """Applies the structure events of one action frame
+
+        Args:
+            message: The action frame as the JSON string from the engine
+            events: The already parsed events of the frame, if there are any
+
+        """
+        if events is None:
+            if '"spawn":[]' in message and '"death":[]' in message and '"damage":[]' in message:
+                return
+            events = decode_field(message, "events")
+            if events is None:
+                return
+
+        size = self.ARENA_SIZE
+        for location, type_index, unit_id, owner in events.get("spawn", ()):
+            x, y = int(location[0]), int(location[1])
+            index = x * size + y
+            if type_index in STRUCTURE_INDICES:
+                self._units[index] = GameUnit(self._shorthands[type_index], self.config, owner - 1, None, x, y)
+                self._ids[index] = unit_id
+            elif index in self._units:
+                if type_index == UPGRADE_INDEX and not self._units[index].upgraded:
+                    self._units[index].upgrade()
+                elif type_index == REMOVE_INDEX:
+                    self._units[index].pending_removal = True
+        for event in events.get("death", ()):
+            location, type_index, unit_id = event[:3]
+            index = int(location[0]) * size + int(location[1])
+            if type_index in STRUCTURE_INDICES and self._ids.get(index) == unit_id:
+                del self._units[index]
+                del self._ids[index]
+        for location, damage, type_index, unit_id, owner in events.get("damage", ()):
+            index = int(location[0]) * size + int(location[1])
+            if type_index in STRUCTURE_INDICES and self._ids.get(index) == unit_id:
+                self._units[index].health -= damage
+
+    def start_turn(self, state):
+        """Reconciles the tracked board with a turn message and computes the delta since the previous one
+
+        Args:
+            state: The parsed turn message
+
+        """
+        size = self.ARENA_SIZE
+        parsed = {}
+        for player_index, key in ((0, "p1Units"), (1, "p2Units")):
+            units = state[key]
+            for type_index in STRUCTURE_INDICES:
+                for entry in units[type_index]:
+                    x, y = int(entry[0]), int(entry[1])
+                    parsed[x * size + y] = [type_index, player_index, float(entry[2]), entry[3], False, False]
+            for type_index, flag in ((UPGRADE_INDEX, 4), (REMOVE_INDEX, 5)):
+                for entry in units[type_index] if len(units) > type_index else ():
+                    index = int(entry[0]) * size + int(entry[1])
+                    if index in parsed:
+                        parsed[index][flag] = True
+
+        mismatches = []
+        for index in set(parsed) | set(self._units):
+            if index not in parsed:
+                mismatches.append("{} at {} is not in the turn message".format(self._units[index].unit_type, divmod(index, size)))
+                del self._units[index]
+                del self._ids[index]
+                continue
+            type_index, player_index, health, unit_id, upgraded, pending_removal = parsed[index]
+            unit = self._units.get(index)
+            if unit is None or self._ids[index] != unit_id or unit.unit_type != self._shorthands[type_index] or unit.player_index != player_index:
+                if unit is None:
+                    mismatches.append("{} at {} is only in the turn message".format(self._shorthands[type_index], divmod(index, size)))
+                else:
+                    mismatches.append("{} at {} is {} {} in the turn message".format(unit.unit_type, divmod(index, size), self._shorthands[type_index], unit_id))
+                unit = GameUnit(self._shorthands[type_index], self.config, player_index, health, *divmod(index, size))
+                self._units[index] = unit
+                self._ids[index] = unit_id
+            if unit.upgraded != upgraded:
+                mismatches.append("{} at {} has upgraded {} instead of {}".format(unit.unit_type, divmod(index, size), unit.upgraded, upgraded))
+                if upgraded:
+                    unit.upgrade()
+                else:
+                    self._units[index] = unit = GameUnit(unit.unit_type, self.config, player_index, health, unit.x, unit.y)
+            if abs(unit.health - health) > HEALTH_TOLERANCE:
+                mismatches.append("{} at {} has {} health instead of {}".format(unit.unit_type, divmod(index, size), unit.health, health))
+                unit.health = health
+            unit.pending_removal = pending_removal
+
+        self.corrections += len(mismatches)
+        if mismatches:
+            if self.verify:
+                raise AssertionError("Tracked board differs from turn {}: {}".format(state["turnInfo"][1], "; ".join(sorted(mismatches))))
+            debug_write("Corrected {} tracked structures from the turn message".format(len(mismatches)))
+        self.__update_delta()
+
+    def __update_delta(self):
+        size = self.ARENA_SIZE
+        previous = self._turn_start
+        current = {index: (self._ids[index], unit.health, unit.upgraded) for index, unit in self._units.items()}
+        added, removed, damaged, upgraded = [], [], [], []
+        for index in sorted(set(previous) | set(current)):
+            before, after = previous.get(index), current.get(index)
+            if before is not None and (after is None or after[0] != before[0]):
+                removed.append(list(divmod(index, size)))
+            if after is not None and (before is None or after[0] != before[0]):
+                added.append(list(divmod(index, size)))
+            elif after is not None:
+                if after[1] < before[1] - HEALTH_TOLERANCE:
+                    damaged.append(list(divmod(index, size)))
+                if after[2] and not before[2]:
+                    upgraded.append(list(divmod(index, size)))
+        self.delta = BoardDelta(added, removed, damaged, upgraded)
+        self._turn_start = current
+
+    def copy_units(self):
+        """Gets copies of the tracked structures, which can be changed without affecting the tracker
+        """
+        return [copy.copy(unit) for unit in self.units()]
@@ -0,0 +1,114 @@
+from collections import Counter, deque
+
+
+def _spawn_failed(unit_type, location, affordable, blocked, correct_territory, on_edge):
+    fail_reason = ""
+    if not affordable:
+        fail_reason = fail_reason + " Not enough resources."
+    if blocked:
+        fail_reason = fail_reason + " Location is blocked."
+    if not correct_territory:
+        fail_reason = fail_reason + " Location in enemy territory."
+    if not on_edge:
+        fail_reason = fail_reason + " Information units must be deployed on the edge."
+    return "Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason)
+
+
+# Warning codes and how to turn their arguments into a message, either a str.format template or a function
+MESSAGES = {
+    "invalid_player_index": "Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)",
+    "invalid_unit": "Invalid unit {}",
+    "invalid_resource_type": "Invalid resource_type '{}'. Please use MP (0) or SP (1)",
+    "zero_cost": "Invalid costs for unit, cost is 0 for both resources, returning 0",
+    "invalid_turns_in_future": "Invalid turns in future used ({}). Turns in future should be between 1 and 99",
+    "negative_mp": "Invalid current MP ({}). Current MP cannot be negative.",
+    "spawn_out_of_bounds": "Could not spawn {} at location {}. Location invalid.",
+    "spawn_failed": _spawn_failed,
+    "spawn_fewer_than_one": "Attempted to spawn fewer than one units! ({})",
+    "remove_failed": "Could not remove a unit from {}. Location has no structures or is enemy territory.",
+    "upgrade_fewer_than_one": "Attempted to upgrade fewer than one units!",
+    "upgrade_failed": "Could not upgrade a unit from {}. Location has no structures or is enemy territory.",
+    "path_from_blocked": "Attempted to perform pathing from blocked starting location {}",
+    "placement_invalid": "Could not evaluate a placement at {}. Location invalid.",
+    "stationary_out_of_bounds": "Checked for stationary unit outside of arena bounds",
+    "target_not_unit": "Passed a {} to get_target as attacking_unit. Expected a GameUnit.",
+    "location_out_of_bounds": "Location {} is not in the arena bounds.",
+    "out_of_bounds": "{} is out of bounds.",
+    "invalid_quadrant": "Passed invalid quadrant_description '{}'. See the documentation for valid inputs for {}.",
+    "invalid_map_player_index": "Player index {} is invalid. Player index should be 0 or 1.",
+    "invalid_radius": "Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}",
+    "simulated_structure": "Only mobile units can be added to a simulation, {} is a structure.",
+    "invalid_savepoint": "Savepoint {} is not being recorded. Use one returned by savepoint() before it was released.",
+}
+
+
+def format_warning(code, args):
+    """Turns a recorded warning into its message
+
+    Args:
+        code: A key of MESSAGES. Any other string is treated as a message of its own, formatted with args if there are any.
+        args: The arguments recorded with the warning
+
+    Returns:
+        The warning message
+
+    """
+    message = MESSAGES.get(code, code)
+    if callable(message):
+        return message(*args)
+    return message.format(*args) if args else message
+
+
+class Diagnostics:
+    """Counts the warnings raised while working on a turn, and keeps the latest ones unformatted
+
+    GameState, its GameMap and the simulators share one Diagnostics per turn. Warnings are always counted,
+    and only formatted when they are printed, so a strategy that spawns in a loop with warnings suppressed
+    pays for a counter increment instead of a message.
+
+    Attributes :
+        * counts (Counter): How many times each warning code was raised
+        * recent (deque): The latest (code, args) pairs, newest last
+
+    """
+    RECENT_LIMIT = 100
+
+    def __init__(self):
+        self.counts = Counter()
+        self.recent = deque(maxlen=self.RECENT_LIMIT)
+
+    def record(self, code, args=()):
+        """Counts a warning
+
+        Args:
+            code: The warning code, see MESSAGES
+            args: The arguments of its message
+
+        """
+        self.counts[code] += 1
+        self.recent.append((code, args))
+
+    def count(self, code=None):
+        """Gets the number of warnings raised
+
+        Args:
+            code: Only count warnings with this code. Defaults to counting all of them.
+
+        Returns:
+            The number of warnings
+
+        """
+        if code is None:
+            return sum(self.counts.values())
+        return self.counts[code]
+
+    def messages(self):
+        """Formats the recent warnings, oldest first
+        """
+        return [format_warning(code, args) for code, args in self.recent]
+
+    def reset(self):
+        """Forgets every warning
+        """
+        self.counts.clear()
+        self.recent.clear()
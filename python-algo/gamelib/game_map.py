@@ -1,6 +1,91 @@
+import copy
 import math
-from .unit import GameUnit
+from .unit import GameUnit, compile_unit_specs
+from .unit_table import UnitTable, type_codes
 from .util import debug_write
+from .diagnostics import Diagnostics, format_warning
+
+
+_BOARD_MASKS = {}
+
+def _in_diamond(x, y, size):
+    half_board = size // 2
+
+    row_size = y + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < half_board and x >= startx and x <= endx)
+
+    row_size = (size - 1 - y) + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= half_board and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+def _board_masks(size):
+    """Builds (once per arena size) the constant bitboards describing the arena.
+
+    Returns:
+        A dict with the in bounds bytearray and mask, the four edge masks (indexed like get_edges),
+        the two half masks (indexed by player) and one mask per row.
+
+    """
+    masks = _BOARD_MASKS.get(size)
+    if masks is not None:
+        return masks
+
+    half = size // 2
+    in_bounds = bytearray(size * size)
+    in_bounds_mask = 0
+    rows = [0] * size
+    halves = [0, 0]
+    for x in range(size):
+        for y in range(size):
+            if _in_diamond(x, y, size):
+                bit = 1 << (x * size + y)
+                in_bounds[x * size + y] = 1
+                in_bounds_mask |= bit
+                rows[y] |= bit
+                halves[0 if y < half else 1] |= bit
+
+    edges = [0, 0, 0, 0]
+    for num in range(half):
+        edges[0] |= 1 << ((half + num) * size + size - 1 - num)
+        edges[1] |= 1 << ((half - 1 - num) * size + size - 1 - num)
+        edges[2] |= 1 << ((half - 1 - num) * size + num)
+        edges[3] |= 1 << ((half + num) * size + num)
+
+    masks = {"in_bounds": in_bounds, "in_bounds_mask": in_bounds_mask, "edges": edges, "halves": halves, "rows": rows}
+    _BOARD_MASKS[size] = masks
+    return masks
+
+
+_RANGE_TABLES = {}
+
+def _range_table(size, radius, hit_radius):
+    """Gets the table of _locations_in_range results for one radius, shared by every map of the same size.
+
+    Returns:
+        A tuple (offsets, results). offsets are the (dx, dy) pairs in range of a tile, ordered by dx and then dy.
+        results[x * size + y] caches the clipped locations around [x, y] once they have been asked for.
+
+    """
+    key = (size, radius, hit_radius)
+    table = _RANGE_TABLES.get(key)
+    if table is not None:
+        return table
+
+    search_radius = int(math.ceil(radius))
+    offsets = []
+    for dx in range(-search_radius, search_radius + 1):
+        for dy in range(-search_radius, search_radius + 1):
+            # A unit with a given range affects all locations who's centers are within that range + get hit radius
+            if math.sqrt(dx**2 + dy**2) < radius + hit_radius:
+                offsets.append((dx, dy))
+    table = (tuple(offsets), [None] * (size * size))
+    _RANGE_TABLES[key] = table
+    return table
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -12,6 +97,7 @@ class GameMap:
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
+        * diagnostics (Diagnostics): Counts the warnings raised, even when they don't print out
         * ARENA_SIZE (int): The size of the arena.
         * HALF_ARENA (int): Half of the size of the arena.
         * TOP_RIGHT (int): A constant that represents the top right edge
@@ -19,6 +105,17 @@ class GameMap:
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
 
+    Sets of tiles are also available as integer bitboards, with bit x * ARENA_SIZE + y standing for tile [x, y].
+    The arena, its edges, halves and rows are constant masks, and the tiles holding each player's structures are
+    kept in sync by add_unit, remove_unit and assignments through game_map[x, y]. Mutating the list returned by
+    game_map[x, y] directly bypasses this bookkeeping. Masks combine with the usual integer operators
+    (|, &, ~) and can be counted with count_mask or turned back into locations with mask_locations.
+
+    Units parsed by GameState in lazy mode are kept as raw tuples, and only become GameUnits when their tile is
+    read through game_map[x, y]. The masks are kept up to date either way.
+    For queries over many units, unit_table() returns all of them as columns.
+    fork() makes a copy on write child of the map for trying changes, see GameState.fork.
+
     """
     def __init__(self, config):
         """Initializes constants and game map
@@ -29,6 +126,7 @@ class GameMap:
         """
         self.config = config
         self.enable_warnings = True
+        self.diagnostics = Diagnostics()
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
         self.TOP_RIGHT = 0
@@ -36,17 +134,31 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
+        self.__raw = {}
+        self.__shared = False
+        self.__owned = set()
+        self._undo_log = None
         self.__start = [13,0]
+        self.__masks = _board_masks(self.ARENA_SIZE)
+        self.__in_bounds = self.__masks["in_bounds"]
+        self._structure_mask = 0
+        self._player_structure_masks = [0, 0]
+        self._structure_version = 0
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
+            if self.__raw:
+                self.__materialize(x, y)
             return self.__map[x][y]
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__replace_tile(x, y)
+            self.__map[x][y] = val
+            self.__update_structure_mask(x, y)
             return
         self._invalid_coordinates(location)
 
@@ -68,15 +180,27 @@ class GameMap:
         return location 
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[[] for _ in range(self.ARENA_SIZE)] for _ in range(self.ARENA_SIZE)]
+
+    def __update_structure_mask(self, x, y):
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        self.__clear_structure_bit(bit)
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.__set_structure_bit(bit, unit.player_index)
+
+    def __set_structure_bit(self, bit, player_index):
+        self._player_structure_masks[0 if player_index == 0 else 1] |= bit
+        self._structure_mask |= bit
+
+    def __clear_structure_bit(self, bit):
+        if self._structure_mask & bit:
+            self._player_structure_masks[0] &= ~bit
+            self._player_structure_masks[1] &= ~bit
+            self._structure_mask &= ~bit
 
     def _invalid_coordinates(self, location):
-        self.warn("{} is out of bounds.".format(str(location)))
+        self.warn("out_of_bounds", location)
 
     def in_arena_bounds(self, location):
         """Checks if the given location is inside the diamond shaped game board.
@@ -89,19 +213,10 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if type(x) is int and type(y) is int:
+            size = self.ARENA_SIZE
+            return 0 <= x < size and 0 <= y < size and self.__in_bounds[x * size + y] == 1
+        return _in_diamond(x, y, self.ARENA_SIZE)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -114,7 +229,7 @@ class GameMap:
 
         """
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
-            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
+            self.warn("invalid_quadrant", quadrant_description, "get_edge_locations")
             return
 
         edges = self.get_edges()
@@ -163,15 +278,30 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         if player_index < 0 or player_index > 1:
-            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+            self.warn("invalid_map_player_index", player_index)
 
-        x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
-        if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+        self._place_unit(new_unit)
+
+    def _place_unit(self, unit):
+        """Puts an existing GameUnit on the map at its own location, replacing whatever was there if it is a structure.
+        """
+        x, y = unit.x, unit.y
+        if not unit.stationary:
+            if self.__raw:
+                self.__materialize(x, y)
+            self.__own_tile(x * self.ARENA_SIZE + y)
+            self.__map[x][y].append(unit)
+            if self._undo_log is not None:
+                self._undo_log.append((self.__undo_append, x, y))
         else:
-            self.__map[x][y] = [new_unit]
+            self.__replace_tile(x, y)
+            self.__map[x][y] = [unit]
+            bit = 1 << (x * self.ARENA_SIZE + y)
+            self.__clear_structure_bit(bit)
+            self.__set_structure_bit(bit, unit.player_index)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -184,9 +314,322 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         
         x, y = location
+        self.__replace_tile(x, y)
         self.__map[x][y] = []
+        self.__clear_structure_bit(1 << (x * self.ARENA_SIZE + y))
+
+    def _place_raw(self, unit_type, player_index, health, x, y, stationary):
+        """Like _place_unit, but keeps the unit as a tuple until its tile is read. Used by GameState in lazy mode.
+        """
+        index = x * self.ARENA_SIZE + y
+        if stationary:
+            self.__replace_tile(x, y)
+            self.__map[x][y] = []
+            self.__raw[index] = [[unit_type, player_index, health, False, False]]
+            bit = 1 << index
+            self.__clear_structure_bit(bit)
+            self.__set_structure_bit(bit, player_index)
+        else:
+            # materializing appends after any units already on the tile, like _place_unit
+            self.__own_tile(index)
+            self.__raw.setdefault(index, []).append([unit_type, player_index, health, False, False])
+
+    def _flag_raw(self, x, y, upgraded=False, pending_removal=False):
+        """Upgrades or flags for removal the structure at a location, without creating its GameUnit if it is still raw
+        """
+        self.__own_tile(x * self.ARENA_SIZE + y)
+        raw = self.__raw.get(x * self.ARENA_SIZE + y)
+        units = raw if raw is not None else self.__map[x][y]
+        for unit in units:
+            if raw is not None:
+                if compile_unit_specs(self.config)[unit[0]].stationary:
+                    unit[3] = unit[3] or upgraded
+                    unit[4] = unit[4] or pending_removal
+            elif unit.stationary:
+                if upgraded and not unit.upgraded:
+                    unit.upgrade()
+                if pending_removal:
+                    unit.pending_removal = True
+
+    def _structure_spec(self, x, y):
+        """Gets the UnitSpec and player index of the structure at a location, without creating its GameUnit if it is still raw
+
+        Returns:
+            A tuple (spec, player_index), with the upgraded spec for upgraded structures, or None if there is no structure
+        """
+        index = x * self.ARENA_SIZE + y
+        if not (self._structure_mask >> index) & 1:
+            return None
+        for unit_type, player_index, health, upgraded, pending_removal in self.__raw.get(index, ()):
+            spec = compile_unit_specs(self.config)[unit_type]
+            if spec.stationary:
+                return (spec.upgrade or spec) if upgraded else spec, player_index
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                return unit.spec, unit.player_index
+        return None
+
+    def _unit_count(self, x, y):
+        """Counts the units at a location, raw ones included, without creating any GameUnit
+        """
+        return len(self.__map[x][y]) + len(self.__raw.get(x * self.ARENA_SIZE + y, ()))
+
+    def __materialize(self, x, y):
+        if x * self.ARENA_SIZE + y not in self.__raw:
+            return
+        self.__own_tile(x * self.ARENA_SIZE + y)
+        raw = self.__raw.pop(x * self.ARENA_SIZE + y)
+        tile = self.__map[x][y]
+        for unit_type, player_index, health, upgraded, pending_removal in raw:
+            unit = GameUnit(unit_type, self.config, player_index, health, x, y)
+            if upgraded:
+                unit.upgrade()
+            unit.pending_removal = pending_removal
+            tile.append(unit)
+
+    def _writable_units(self, x, y):
+        """Gets the list of units at a location, to change it or its units in place
+
+        On a forked map, the tile and its units are copied first, so the change doesn't reach the other maps.
+        While GameState is recording changes, they are copied too, and the originals kept for rollback.
+        """
+        if self.__raw:
+            self.__materialize(x, y)
+        if self._undo_log is not None:
+            units = self.__map[x][y]
+            self.__replace_tile(x, y)
+            self.__map[x][y] = [copy.copy(unit) for unit in units]
+        else:
+            self.__own_tile(x * self.ARENA_SIZE + y)
+        return self.__map[x][y]
+
+    def __own_tile(self, index):
+        # copy on write: the first change to a tile shared with other forks copies it and its units
+        if self.__shared and index not in self.__owned:
+            self.__owned.add(index)
+            x, y = divmod(index, self.ARENA_SIZE)
+            self.__map[x][y] = [copy.copy(unit) for unit in self.__map[x][y]]
+            raw = self.__raw.get(index)
+            if raw is not None:
+                self.__raw[index] = [list(entry) for entry in raw]
+
+    def __replace_tile(self, x, y):
+        # the tile is about to be replaced as a whole, so there is nothing to copy
+        index = x * self.ARENA_SIZE + y
+        raw = self.__raw.pop(index, None)
+        if self._undo_log is not None:
+            self._undo_log.append((self.__restore_tile, x, y, self.__map[x][y], raw,
+                                   self._structure_mask, list(self._player_structure_masks), self._structure_version))
+        self._structure_version += 1
+        if self.__shared:
+            self.__owned.add(index)
+
+    def __restore_tile(self, x, y, units, raw, structure_mask, player_structure_masks, structure_version):
+        index = x * self.ARENA_SIZE + y
+        self.__map[x][y] = units
+        if raw is None:
+            self.__raw.pop(index, None)
+        else:
+            self.__raw[index] = raw
+        self._structure_mask = structure_mask
+        self._player_structure_masks = player_structure_masks
+        self._structure_version = structure_version
+        # the restored tile may be shared with a fork made since it was replaced
+        if self.__shared:
+            self.__owned.discard(index)
+
+    def __undo_append(self, x, y):
+        self.__own_tile(x * self.ARENA_SIZE + y)
+        self.__map[x][y].pop()
+
+    def fork(self):
+        """Makes a copy of the map that shares its config and unchanged tiles with this one
+
+        Tiles are copied, with their units, the first time either map changes them through GameMap,
+        so a fork costs a few microseconds however many units there are. Forks can be forked again.
+        Units read through game_map[x, y] may be shared with other forks, so change them through GameMap or GameState only.
+
+        Returns:
+            The new GameMap
+
+        """
+        child = GameMap.__new__(type(self))
+        child.__dict__.update(self.__dict__)
+        child.__map = list(map(list.copy, self.__map))
+        child.__raw = dict(self.__raw)
+        child._player_structure_masks = list(self._player_structure_masks)
+        child.__owned = set()
+        child.__shared = True
+        child._undo_log = None
+        self.__owned = set()
+        self.__shared = True
+        return child
+
+    def unit_table(self):
+        """Gets every unit on the map as a columnar UnitTable, for queries over many units at once
+
+        Units kept raw by lazy parsing are read without creating their GameUnits.
+        The table is a snapshot, so get a new one after changing the map.
+
+        Returns:
+            A UnitTable with one row per unit, ordered by location
+
+        """
+        specs = compile_unit_specs(self.config)
+        codes = type_codes(self.config)
+        raw_units = self.__raw
+        size = self.ARENA_SIZE
+        rows = []
+        for x, column in enumerate(self.__map):
+            for y, tile in enumerate(column):
+                for unit in tile:
+                    cost = unit.cost
+                    rows.append((x, y, codes[unit.unit_type], unit.player_index, unit.health, unit.upgraded,
+                                 unit.pending_removal, cost[0], cost[1]))
+                if raw_units:
+                    for unit_type, player_index, health, upgraded, pending_removal in raw_units.get(x * size + y, ()):
+                        spec = specs[unit_type]
+                        if not health:
+                            health = spec.max_health
+                        if upgraded and spec.upgrade is not None:
+                            spec = spec.upgrade
+                        rows.append((x, y, codes[unit_type], player_index, health, upgraded, pending_removal,
+                                     spec.cost[0], spec.cost[1]))
+        return UnitTable(self.config, rows)
+
+    def get_obstruction_signature(self):
+        """Identifies the current set of tiles blocked by structures.
+
+        Two maps return the same signature exactly when the same tiles hold structures, so it can be used
+        as a cache key for anything that only depends on which tiles are blocked, such as pathing.
+
+        Returns:
+            An integer with bit x * ARENA_SIZE + y set for every tile that holds a structure
+        """
+        return self._structure_mask
+
+    def get_structure_version(self):
+        """Counts the changes made to the structures on the map
+
+        Unlike the obstruction signature, it also changes when a structure is replaced by another one on the same tile,
+        so it can be used as a cache key for anything that depends on which structures are where, such as threat maps.
+        Every add_unit or remove_unit of a structure, and every assignment through game_map[x, y], changes it.
+
+        Rolling back a GameState savepoint restores the version the map had, along with its tiles.
+
+        Returns:
+            An integer, different after any such change
+        """
+        return self._structure_version
+
+    def get_structure_mask(self, player_index=None):
+        """Gets the tiles holding structures as a bitboard
+
+        Args:
+            player_index: 0 for your structures, 1 for the enemy's, None for both
+
+        Returns:
+            A mask with bit x * ARENA_SIZE + y set for every matching tile
+        """
+        if player_index is None:
+            return self._structure_mask
+        return self._player_structure_masks[player_index]
+
+    def get_in_bounds_mask(self):
+        """Gets every tile of the diamond shaped board as a bitboard
+        """
+        return self.__masks["in_bounds_mask"]
+
+    def get_edge_mask(self, quadrant_description):
+        """Gets the locations returned by get_edge_locations as a bitboard
+
+        Args:
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            A mask of the tiles on the requested edge
+        """
+        if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
+            self.warn("invalid_quadrant", quadrant_description, "get_edge_mask")
+            return 0
+        return self.__masks["edges"][quadrant_description]
+
+    def get_half_mask(self, player_index):
+        """Gets the half of the board a player may build on as a bitboard
+
+        Args:
+            player_index: 0 for your half (the bottom), 1 for the enemy's half (the top)
+
+        Returns:
+            A mask of the tiles in that half
+        """
+        return self.__masks["halves"][player_index]
+
+    def get_rows_mask(self, first_row, last_row=None):
+        """Gets the in bounds tiles of one or more rows as a bitboard
+
+        Args:
+            first_row: The y coordinate of the first row
+            last_row: The y coordinate of the last row, inclusive. Defaults to first_row.
+
+        Returns:
+            A mask of the tiles with first_row <= y <= last_row
+        """
+        if last_row is None:
+            last_row = first_row
+        rows = self.__masks["rows"]
+        mask = 0
+        for y in range(max(first_row, 0), min(last_row, self.ARENA_SIZE - 1) + 1):
+            mask |= rows[y]
+        return mask
+
+    def get_location_mask(self, locations):
+        """Gets a bitboard holding the given locations
+
+        Args:
+            locations: A list of locations
+
+        Returns:
+            A mask with the bit of every in bounds location set
+        """
+        mask = 0
+        for location in locations:
+            if self.in_arena_bounds(location):
+                mask |= 1 << (int(location[0]) * self.ARENA_SIZE + int(location[1]))
+        return mask
+
+    def mask_locations(self, mask):
+        """Lists the locations in a bitboard
+
+        Args:
+            mask: A bitboard, such as one returned by get_structure_mask
+
+        Returns:
+            A list of [x, y] locations, ordered by x and then y
+        """
+        size = self.ARENA_SIZE
+        locations = []
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            locations.append([index // size, index % size])
+            mask ^= low
+        return locations
+
+    @staticmethod
+    def count_mask(mask):
+        """Counts the tiles in a bitboard
+
+        Args:
+            mask: A bitboard
+
+        Returns:
+            The number of set bits
+        """
+        return bin(mask).count("1")
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -198,23 +641,40 @@ class GameMap:
         Returns:
             The locations that are within our search area
 
+        """
+        return [[x, y] for x, y in self._locations_in_range(location, radius)]
+
+    def _locations_in_range(self, location, radius):
+        """Like get_locations_in_range, but returns a tuple of (x, y) tuples. For whole number centers
+        the same tuple, from the range tables, is returned on every call, so it must not be modified.
         """
         if radius < 0 or radius > self.ARENA_SIZE:
-            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
+            self.warn("invalid_radius", radius, self.ARENA_SIZE)
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
         x, y = location
+        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
+        size = self.ARENA_SIZE
+        if type(x) is int and type(y) is int and 0 <= x < size and 0 <= y < size:
+            offsets, results = _range_table(size, radius, getHitRadius)
+            locations = results[x * size + y]
+            if locations is None:
+                in_bounds = self.__in_bounds
+                locations = tuple((x + dx, y + dy) for dx, dy in offsets
+                                  if 0 <= x + dx < size and 0 <= y + dy < size and in_bounds[(x + dx) * size + y + dy])
+                results[x * size + y] = locations
+            return locations
+
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
                 # A unit with a given range affects all locations who's centers are within that range + get hit radius
                 if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+                    locations.append((i, j))
+        return tuple(locations)
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
@@ -232,9 +692,11 @@ class GameMap:
 
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
-    def warn(self, message):
+    def warn(self, message, *args):
         """
-        Used internally by game_map to print out default messaging
+        Used internally by game_map to print out default messaging.
+        message is a warning code from gamelib.diagnostics, or any other message; it is only formatted with args if warnings are enabled.
         """
+        self.diagnostics.record(message, args)
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(format_warning(message, args))
@@ -1,11 +1,12 @@
 import math
-import json
 import sys
+from contextlib import contextmanager
 
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
+from .navigation import DynamicShortestPathFinder
+from .util import send_command, debug_write, parse_message, json_dumps
+from .unit import GameUnit, compile_unit_specs
 from .game_map import GameMap
+from .diagnostics import Diagnostics, format_warning
 
 def is_stationary(unit_type):
     """
@@ -44,18 +45,42 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache_hits (int): The number of find_path_to_edge calls answered from the path cache
+        * path_cache_misses (int): The number of find_path_to_edge calls that had to run the pathfinder
+        * USE_NUMPY_PATHING (bool): If true, pathfinding uses the NumPy backend of gamelib.navigation when NumPy is installed
+        * diagnostics (Diagnostics): Counts the warnings raised this turn by the game state and its map, even when they are suppressed
+        * LAZY_UNITS (bool): If true, parsed units only become GameUnits when their tile is read through game_map[x, y].
+          Structure masks, pathing, threat_map, estimate_path_damage and the spawn checks don't need them, so this speeds up
+          turns that mostly path. contains_stationary_unit, get_attackers and get_target read tiles, so they create them.
+
+    Structures added or replaced through the game_map are tracked through its structure version, but upgrades are
+    only noticed by threat_map when they go through attempt_upgrade.
+
+    Moves can be tried without changing the state for good, either on a child from fork(), or inside
+    a transaction() whose changes are rolled back, see savepoint and rollback.
 
     """
 
-    def __init__(self, config, serialized_string):
+    PATH_CACHE_LIMIT = 4096
+    SHOT_COUNT_BITS = 16
+    USE_NUMPY_PATHING = False
+    LAZY_UNITS = False
+
+    def __init__(self, config, serialized_string, board=None):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string: The game state at the start of this turn, as the message from the engine, a JSON string or an already parsed dict
+            * board (BoardTracker): A tracker already reconciled with this turn. If given, structures are copied from it instead of parsed.
 
         """
-        self.serialized_string = serialized_string
+        if isinstance(serialized_string, dict):
+            self._serialized_string = None
+            self._state = serialized_string
+        else:
+            self._serialized_string = serialized_string
+            self._state = parse_message(serialized_string)
         self.config = config
         self.enable_warnings = True
 
@@ -89,22 +114,140 @@ class GameState:
         MP = self.MP
         SP = self.SP
 
+        self.diagnostics = Diagnostics()
         self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self.game_map.diagnostics = self.diagnostics
+        self._max_attack_range = 0
+        for unit_information in self.config["unitInformation"]:
+            upgrade = unit_information.get("upgrade") or {}
+            self._max_attack_range = max(self._max_attack_range, unit_information.get('attackRange', 0) or 0, upgrade.get('attackRange', 0) or 0)
+        # the distinct damage_i of structure shots, each with a count grid in the threat maps
+        specs = compile_unit_specs(self.config)
+        self._shot_damages = sorted({spec.damage_i for base in specs.values() for spec in (base, base.upgrade)
+                                     if spec is not None and spec.stationary and spec.damage_i > 0})
+        self._threat_maps = None
+        self._threat_version = None
+        self._threat_shared = False
+        self._threat_tiles = {}
+        self._path_finders = {}
+        self._path_cache = {}
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
         self._build_stack = []
         self._deploy_stack = []
+        self._undo_log = None
+        self._open_savepoints = 0
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        self.__parse_state(self._state, board)
+
+    def fork(self):
+        """Makes a child state to try moves on without changing this one
+
+        The child shares the config, the parsed turn, the path cache and the unchanged tiles of the map with this state,
+        see GameMap.fork. Resources and the build and deploy stacks are copied, and the threat maps are copied
+        the first time either state changes them. The child counts its warnings in diagnostics of its own. Forks can be forked again, for example once per level of a search.
+
+        Returns:
+            A GameState that starts out equal to this one
 
-    def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        child = GameState.__new__(type(self))
+        child.__dict__.update(self.__dict__)
+        child.game_map = self.game_map.fork()
+        child.diagnostics = child.game_map.diagnostics = Diagnostics()
+        child._player_resources = [dict(resources) for resources in self._player_resources]
+        child._build_stack = list(self._build_stack)
+        child._deploy_stack = list(self._deploy_stack)
+        child._undo_log = None
+        child._open_savepoints = 0
+        if self._threat_maps is not None:
+            self._threat_shared = child._threat_shared = True
+        return child
+
+    def savepoint(self):
+        """Starts recording changes to this state, so they can be undone with rollback
+
+        Every change made by attempt_spawn, attempt_remove, attempt_upgrade and the game_map's add_unit, remove_unit
+        and assignments is recorded, with what it replaced. That covers resources, the map, the build and deploy stacks
+        and the threat maps. Savepoints nest, and rolling back costs one step per recorded change.
+
+        Returns:
+            A savepoint to pass to rollback or release
+
+        """
+        if self._undo_log is None:
+            self._undo_log = []
+            self.game_map._undo_log = self._undo_log
+        self._open_savepoints += 1
+        return len(self._undo_log)
+
+    def rollback(self, savepoint):
+        """Undoes every recorded change made since a savepoint. The savepoint can be rolled back to again.
+
+        Args:
+            savepoint: A savepoint returned by savepoint()
+
+        """
+        log = self._undo_log
+        if log is None or not 0 <= savepoint <= len(log):
+            self.warn("invalid_savepoint", savepoint)
+            return
+        while len(log) > savepoint:
+            entry = log.pop()
+            entry[0](*entry[1:])
+
+    def release(self, savepoint):
+        """Keeps the changes made since a savepoint. They stay undoable by rolling back to an earlier savepoint,
+        and once every savepoint is released the recording stops.
+
+        Args:
+            savepoint: A savepoint returned by savepoint()
+
+        """
+        if self._undo_log is None or not 0 <= savepoint <= len(self._undo_log):
+            self.warn("invalid_savepoint", savepoint)
+            return
+        self._open_savepoints -= 1
+        if self._open_savepoints == 0:
+            self._undo_log = None
+            self.game_map._undo_log = None
+
+    @contextmanager
+    def transaction(self, commit=False):
+        """Undoes the changes made in a with block when it exits
+
+        with game_state.transaction(): tries moves and rolls them back, so a depth first search can explore
+        one branch at a time on a single state instead of copying it.
+
+        Args:
+            commit: If True, keep the changes when the block exits normally. They are rolled back if it raises.
+
+        """
+        savepoint = self.savepoint()
+        committed = False
+        try:
+            yield savepoint
+            committed = commit
+        finally:
+            if not committed:
+                self.rollback(savepoint)
+            self.release(savepoint)
+
+    @property
+    def serialized_string(self):
+        """The game state at the start of this turn as a JSON string, serialized on first use if a dict was given
         """
-        state = json.loads(state_line)
+        if self._serialized_string is None:
+            self._serialized_string = json_dumps(self._state)
+        return self._serialized_string
 
+    def __parse_state(self, state, board=None):
+        """
+        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
+        state is the parsed game state, board an optional BoardTracker to take structures from.
+        """
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
 
@@ -123,15 +266,22 @@ class GameState:
         p1units = state["p1Units"]
         p2units = state["p2Units"]
 
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
+        if board is not None:
+            for unit in board.copy_units():
+                self.game_map._place_unit(unit)
+        self.__create_parsed_units(p1units, 0, board is None)
+        self.__create_parsed_units(p2units, 1, board is None)
 
-    def __create_parsed_units(self, units, player_number):
+    def __create_parsed_units(self, units, player_number, structures=True):
         """
         Helper function for __parse_state to add units to the map.
         """
         typedef = self.config.get("unitInformation")
+        specs = compile_unit_specs(self.config)
         for i, unit_types in enumerate(units):
+            # structures, removals and upgrades already came from a BoardTracker
+            if not structures and typedef[i].get("shorthand") not in (SCOUT, DEMOLISHER, INTERCEPTOR):
+                continue
             for uinfo in unit_types:
                 unit_type = typedef[i].get("shorthand")
                 sx, sy, shp = uinfo[:3]
@@ -140,14 +290,19 @@ class GameState:
                 # This depends on RM and UP always being the last types to be processed
                 if unit_type == REMOVE:
                     # Quick fix will deploy engine fix soon
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
+                    if self.__has_structure(x, y):
+                        self.game_map._flag_raw(x, y, pending_removal=True)
                 elif unit_type == UPGRADE:
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                    if self.__has_structure(x, y):
+                        self.game_map._flag_raw(x, y, upgraded=True)
+                elif self.LAZY_UNITS:
+                    self.game_map._place_raw(unit_type, player_number, hp, x, y, specs[unit_type].stationary)
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map._place_unit(unit)
+
+    def __has_structure(self, x, y):
+        return self.game_map.in_arena_bounds([x, y]) and (self.game_map.get_structure_mask() >> (x * self.ARENA_SIZE + y)) & 1 == 1
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -163,21 +318,29 @@ class GameState:
         elif resource_type == self.SP:
             resource_key = 'SP'
         held_resource = self.get_resource(resource_type, player_index)
-        self._player_resources[player_index][resource_key] = held_resource + amount
+        resources = self._player_resources[player_index]
+        if self._undo_log is not None:
+            self._undo_log.append((dict.__setitem__, resources, resource_key, resources[resource_key]))
+        resources[resource_key] = held_resource + amount
+
+    def __push(self, stack, entry):
+        stack.append(entry)
+        if self._undo_log is not None:
+            self._undo_log.append((list.pop, stack))
 
     def _invalid_player_index(self, index):
-        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
+        self.warn("invalid_player_index", index)
     
     def _invalid_unit(self, unit):
-        self.warn("Invalid unit {}".format(unit))
+        self.warn("invalid_unit", unit)
 
     def submit_turn(self):
         """Submit and end your turn.
             Must be called at the end of your turn or the algo will hang.
         """
-        build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
+        build_string = json_dumps(self._build_stack)
+        deploy_string = json_dumps(self._deploy_stack)
+        send_command(build_string, flush=False)
         send_command(deploy_string)
 
     def get_resource(self, resource_type, player_index = 0):
@@ -195,7 +358,7 @@ class GameState:
             self._invalid_player_index(player_index)
             return
         if not resource_type == self.MP and not resource_type == self.SP:
-            self.warn("Invalid resource_type '{}'. Please use MP (0) or SP (1)".format(resource_type))
+            self.warn("invalid_resource_type", resource_type)
             return
 
         if resource_type == self.MP:
@@ -247,7 +410,7 @@ class GameState:
         elif costs[SP] > 0:
             return math.floor(player_held[SP] / costs[SP])
         else:
-            self.warn("Invalid costs for unit, cost is 0 for both resources, returning 0")
+            self.warn("zero_cost")
             return 0
 
     def project_future_MP(self, turns_in_future=1, player_index=0, current_MP=None):
@@ -264,11 +427,11 @@ class GameState:
         """
 
         if turns_in_future < 1 or turns_in_future > 99:
-            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(turns_in_future))
+            self.warn("invalid_turns_in_future", turns_in_future)
         if not player_index == 1 and not player_index == 0:
             self._invalid_player_index(player_index)
         if type(current_MP) == int and current_MP < 0:
-            self.warn("Invalid current MP ({}). Current MP cannot be negative.".format(current_MP))
+            self.warn("negative_mp", current_MP)
 
         MP = self.get_resource(self.MP, player_index) if not current_MP else current_MP
         for increment in range(1, turns_in_future + 1):
@@ -325,33 +488,28 @@ class GameState:
             return
         
         if not self.game_map.in_arena_bounds(location):
-            if self.enable_warnings:
-                self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
+            self.warn("spawn_out_of_bounds", unit_type, location)
             return False
 
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
-        blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
+        blocked = self._holds_structure(location) or (stationary and self.game_map._unit_count(int(location[0]), int(location[1])) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
-
-        if self.enable_warnings:
-            fail_reason = ""
-            if not affordable:
-                fail_reason = fail_reason + " Not enough resources."
-            if blocked:
-                fail_reason = fail_reason + " Location is blocked."
-            if not correct_territory:
-                fail_reason = fail_reason + " Location in enemy territory."
-            if not (stationary or on_edge):
-                fail_reason = fail_reason + " Information units must be deployed on the edge."
-            if len(fail_reason) > 0:
-                self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
-
-        return (affordable and correct_territory and not blocked and
-                (stationary or on_edge) and
+        on_edge = stationary or self.__on_friendly_edge(location)
+
+        if not affordable or blocked or not correct_territory or not on_edge:
+            self.warn("spawn_failed", unit_type, location, affordable, blocked, correct_territory, on_edge)
+
+        return (affordable and correct_territory and not blocked and on_edge and
                 (not stationary or num == 1))
 
+    def __on_friendly_edge(self, location):
+        x, y = location
+        if type(x) is not int or type(y) is not int:
+            return location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        edges = self.game_map.get_edge_mask(self.game_map.BOTTOM_LEFT) | self.game_map.get_edge_mask(self.game_map.BOTTOM_RIGHT)
+        return (edges >> (x * self.ARENA_SIZE + y)) & 1 == 1
+
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
 
@@ -368,7 +526,7 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         if num < 1 or not locations:
-            self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+            self.warn("spawn_fewer_than_one", num)
             return
       
         if type(locations[0]) == int:
@@ -381,11 +539,13 @@ class GameState:
                     costs = self.type_cost(unit_type)
                     self.__set_resource(SP, 0 - costs[SP])
                     self.__set_resource(MP, 0 - costs[MP])
+                    version = self.game_map.get_structure_version()
                     self.game_map.add_unit(unit_type, location, 0)
                     if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
+                        self.__push(self._build_stack, (unit_type, x, y))
+                        self._update_threat(self.game_map[x, y][0], 1, version)
                     else:
-                        self._deploy_stack.append((unit_type, x, y))
+                        self.__push(self._deploy_stack, (unit_type, x, y))
                     spawned_units += 1
                 else:
                     break
@@ -405,12 +565,12 @@ class GameState:
             locations = [locations]
         removed_units = 0
         for location in locations:
-            if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
+            if location[1] < self.HALF_ARENA and self._holds_structure(location):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self.__push(self._build_stack, (REMOVE, x, y))
                 removed_units += 1
             else:
-                self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("remove_failed", location)
         return removed_units
 
     def attempt_upgrade(self, locations):
@@ -425,7 +585,7 @@ class GameState:
         """
 
         if not locations:
-            self.warn("Attempted to upgrade fewer than one units!")
+            self.warn("upgrade_fewer_than_one")
             return
 
         if type(locations[0]) == int:
@@ -435,7 +595,7 @@ class GameState:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
                 existing_unit = None
-                for unit in self.game_map[x,y]:
+                for unit in self.game_map._writable_units(x, y):
                     if unit.stationary:
                         existing_unit = unit
 
@@ -445,11 +605,14 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
+                        version = self.game_map.get_structure_version()
+                        self._update_threat(existing_unit, -1, version)
                         existing_unit.upgrade()
-                        self._build_stack.append((UPGRADE, x, y))
+                        self._update_threat(existing_unit, 1, version)
+                        self.__push(self._build_stack, (UPGRADE, x, y))
                         spawned_units += 1
             else:
-                self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("upgrade_failed", location)
         return spawned_units
 
     def get_target_edge(self, start_location):
@@ -487,16 +650,246 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached by start location, target edge and the map's obstruction signature, so asking again
+        while the same tiles are blocked does not rerun the pathfinder.
+
         """
-        if self.contains_stationary_unit(start_location):
-            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+        if self._holds_structure(start_location):
+            self.warn("path_from_blocked", start_location)
             return
 
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (int(start_location[0]), int(start_location[1]), target_edge, self.game_map.get_obstruction_signature())
+        path = self._path_cache.get(key)
+        if path is None:
+            self.path_cache_misses += 1
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._path_finder(target_edge).navigate_multiple_endpoints(start_location, end_points, self)
+            if len(self._path_cache) >= self.PATH_CACHE_LIMIT:
+                self._path_cache.clear()
+            self._path_cache[key] = path
+        else:
+            self.path_cache_hits += 1
+        # Hand out copies so callers can't corrupt the cached path
+        return [[x, y] for x, y in path]
+
+    def find_paths_to_edge(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take, sharing the pathfinding work between them.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. Induced from each start location if None.
+
+        Returns:
+            A dict mapping each start location, as an (x, y) tuple, to the path find_path_to_edge would return for it.
+            Locations blocked by a structure map to None.
+
+        """
+        signature = self.game_map.get_obstruction_signature()
+        groups = {}
+        paths = {}
+        for location in start_locations:
+            start = (int(location[0]), int(location[1]))
+            edge = self.get_target_edge(start) if target_edge is None else target_edge
+            path = self._path_cache.get((start[0], start[1], edge, signature))
+            if path is not None:
+                self.path_cache_hits += 1
+                paths[start] = path
+            else:
+                groups.setdefault(edge, []).append(start)
+
+        for edge, starts in groups.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            found = self._path_finder(edge).navigate_multiple_starts(starts, end_points, self)
+            if len(self._path_cache) + len(found) > self.PATH_CACHE_LIMIT:
+                self._path_cache.clear()
+            for start, path in found.items():
+                paths[start] = path
+                if path is not None:
+                    self.path_cache_misses += 1
+                    self._path_cache[(start[0], start[1], edge, signature)] = path
+
+        return {start: (None if path is None else [[x, y] for x, y in path]) for start, path in paths.items()}
+
+    def find_paths_from_edges(self, player_index=0):
+        """Gets the path a unit would take from every deploy location on a player's edges.
+
+        Args:
+            player_index: The player whose edges to path from, 0 for you 1 for the enemy
+
+        Returns:
+            A dict mapping each edge location, as an (x, y) tuple, to the path a unit spawned there would take.
+            Edge locations blocked by a structure map to None.
+
+        """
+        if not player_index == 1 and not player_index == 0:
+            self._invalid_player_index(player_index)
+            return
+
+        if player_index == 0:
+            edges = [self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT]
+        else:
+            edges = [self.game_map.TOP_LEFT, self.game_map.TOP_RIGHT]
+        start_locations = []
+        for edge in edges:
+            start_locations += self.game_map.get_edge_locations(edge)
+        return self.find_paths_to_edge(start_locations)
+
+    def evaluate_placements(self, candidates, start_locations, target_edge=None):
+        """Gets the paths units would take if a structure were placed on each candidate tile, one candidate at a time.
+
+        Nothing is added to the map. Each candidate is treated as a temporary block on the shared distance field,
+        and only paths that actually cross the candidate are searched again, since a structure off a unit's path never
+        changes the route that unit picks.
+
+        Args:
+            candidates: A list of locations where a structure could be placed
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. Induced from each start location if None.
+
+        Returns:
+            A dict mapping each candidate, as an (x, y) tuple, to a dict like the one find_paths_to_edge returns.
+            Paths a candidate does not change are shared between candidates and should not be modified.
+
+        """
+        base_paths = self.find_paths_to_edge(start_locations, target_edge)
+        base_tiles = {start: (None if path is None else set((x, y) for x, y in path)) for start, path in base_paths.items()}
+
+        results = {}
+        for location in candidates:
+            candidate = (int(location[0]), int(location[1]))
+            if not self.game_map.in_arena_bounds(candidate):
+                self.warn("placement_invalid", location)
+                continue
+            if self._holds_structure(candidate):
+                results[candidate] = base_paths
+                continue
+
+            paths = {}
+            for start, path in base_paths.items():
+                if path is None or candidate == start:
+                    paths[start] = None
+                elif candidate not in base_tiles[start]:
+                    paths[start] = path
+                else:
+                    edge = self.get_target_edge(start) if target_edge is None else target_edge
+                    finder = self._path_finder(edge)
+                    finder.prepare(self, self.game_map.get_edge_locations(edge))
+                    finder.set_blocked(candidate, True)
+                    paths[start] = finder.navigate(start)
+                    finder.set_blocked(candidate, False)
+            results[candidate] = paths
+        return results
+
+    def _path_finder(self, target_edge):
+        """The pathfinder keeping the distance field toward target_edge, repaired incrementally as structures change
+        """
+        finder = self._path_finders.get(target_edge)
+        if finder is None:
+            finder = DynamicShortestPathFinder(use_numpy=self.USE_NUMPY_PATHING)
+            self._path_finders[target_edge] = finder
+        return finder
+
+    def clear_path_cache(self):
+        """Empties the path cache used by find_path_to_edge and resets its hit and miss counters.
+        Only needed if the map was changed without going through GameMap, for example by editing the unit lists directly.
+        """
+        self._path_cache.clear()
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+
+    def threat_map(self, player_index):
+        """Gets the damage a mobile unit would take on each tile every frame from the opposing structures
+
+        The map is built once per state and then kept up to date by attempt_spawn and attempt_upgrade.
+        It is rebuilt from scratch if structures are added, replaced or removed through the game_map directly.
+
+        Args:
+            player_index: The index corresponding to the mobile unit's owner, 0 for you 1 for the enemy
+
+        Returns:
+            An ARENA_SIZE x ARENA_SIZE list of lists, indexed like game_map, holding the summed damage_i of every structure
+            that would attack a unit of that player at [x, y]. It is shared with the game state and should not be modified.
+            None if player_index is invalid.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return None
+        if self._threat_maps is None or self._threat_version != self.game_map.get_structure_version():
+            if self._undo_log is not None:
+                self._undo_log.append((self.__restore_threat, self._threat_maps, self._threat_version, self._threat_shared))
+            # the summed damage grid of each player, then each player's shot counts: how many shots of every _shot_damages
+            # value hit a tile, packed SHOT_COUNT_BITS bits per value into one integer
+            self._threat_maps = [[[0] * self.ARENA_SIZE for _ in range(self.ARENA_SIZE)] for _ in range(4)]
+            self._threat_shared = False
+            self._threat_version = self.game_map.get_structure_version()
+            for x, y in self.game_map.mask_locations(self.game_map.get_structure_mask()):
+                structure = self.game_map._structure_spec(x, y)
+                if structure is not None and structure[0].damage_i > 0:
+                    spec, owner = structure
+                    self.__add_threat(1 - owner, x, y, spec.attackRange, spec.damage_i, 1)
+        return self._threat_maps[player_index]
+
+    def _update_threat(self, unit, sign, previous_version):
+        """Adds (sign 1) or removes (sign -1) a structure's damage from the threat maps, if they have been built
+
+        previous_version is the map's structure version before the change. If the maps were built for a different one,
+        the map was changed behind their back and they are dropped so the next threat_map call rebuilds them.
+        """
+        if self._threat_maps is None:
+            return
+        if self._undo_log is not None:
+            in_place = self._threat_version == previous_version and not (unit.damage_i > 0 and self._threat_shared)
+            self._undo_log.append((self.__undo_threat, in_place, self._threat_maps, self._threat_version, self._threat_shared,
+                                   unit.player_index, unit.x, unit.y, unit.damage_i, unit.attackRange, sign))
+        if self._threat_version != previous_version:
+            self._threat_maps = None
+            return
+        self._threat_version = self.game_map.get_structure_version()
+        if unit.damage_i <= 0:
+            return
+        if self._threat_shared:
+            self._threat_maps = [[column[:] for column in grid] for grid in self._threat_maps]
+            self._threat_shared = False
+        self.__add_threat(1 - unit.player_index, unit.x, unit.y, unit.attackRange, unit.damage_i, sign)
+
+    def __add_threat(self, player_index, x, y, attack_range, damage_i, sign):
+        # the tiles a structure attacks are the same for every state of the game, so they are kept across forks
+        key = (x, y, attack_range)
+        tiles = self._threat_tiles.get(key)
+        if tiles is None:
+            location = [x, y]
+            tiles = tuple((tx, ty) for tx, ty in self.game_map._locations_in_range(location, attack_range)
+                          if self.game_map.distance_between_locations(location, [tx, ty]) <= attack_range)
+            self._threat_tiles[key] = tiles
+        grid = self._threat_maps[player_index]
+        shots = self._threat_maps[2 + player_index]
+        damage = sign * damage_i
+        shot = sign << (self.SHOT_COUNT_BITS * self._shot_damages.index(damage_i))
+        for tx, ty in tiles:
+            grid[tx][ty] += damage
+            shots[tx][ty] += shot
+
+    def __restore_threat(self, maps, version, shared):
+        self._threat_maps, self._threat_version, self._threat_shared = maps, version, shared
+
+    def __undo_threat(self, in_place, maps, version, shared, player_index, x, y, damage_i, attack_range, sign):
+        if not in_place:
+            # the update dropped or copied maps without changing them
+            self.__restore_threat(maps, version, shared)
+            return
+        if self._threat_maps is not maps:
+            self._threat_maps = None
+            return
+        if damage_i > 0:
+            if self._threat_shared:
+                self._threat_maps = [[column[:] for column in grid] for grid in self._threat_maps]
+                self._threat_shared = False
+            self.__add_threat(1 - player_index, x, y, attack_range, damage_i, -sign)
+        self._threat_version = version
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -508,8 +901,7 @@ class GameState:
             A structures unit if there is a stationary unit at the location, False otherwise
             
         """
-        if not self.game_map.in_arena_bounds(location):
-            self.warn('Checked for stationary unit outside of arena bounds')
+        if not self._holds_structure(location):
             return False
         x, y = map(int, location)
         for unit in self.game_map[x,y]:
@@ -517,12 +909,25 @@ class GameState:
                 return unit
         return False
 
-    def warn(self, message):
-        """ Used internally by game_state to print warnings
+    def _holds_structure(self, location):
+        """Like contains_stationary_unit, but returns a bool read from the structure mask,
+        so it never creates the GameUnit of a raw structure in lazy mode
         """
+        if not self.game_map.in_arena_bounds(location):
+            self.warn("stationary_out_of_bounds")
+            return False
+        x, y = map(int, location)
+        return (self.game_map.get_structure_mask() >> (x * self.ARENA_SIZE + y)) & 1 == 1
+
+    def warn(self, message, *args):
+        """ Used internally by game_state to print warnings
 
+        message is a warning code from gamelib.diagnostics, or any other message. It is counted in
+        self.diagnostics, and only formatted with args if warnings are enabled.
+        """
+        self.diagnostics.record(message, args)
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(format_warning(message, args))
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -551,11 +956,11 @@ class GameState:
         """
 
         if not isinstance(attacking_unit, GameUnit):
-            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
+            self.warn("target_not_unit", type(attacking_unit))
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        possible_locations = self.game_map._locations_in_range(attacker_location, attacking_unit.attackRange)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -629,19 +1034,112 @@ class GameState:
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
-            self.warn("Location {} is not in the arena bounds.".format(location))
+            self.warn("location_out_of_bounds", location)
 
         attackers = []
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
+        possible_locations= self.game_map._locations_in_range(location, self._max_attack_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
                     attackers.append(unit)
         return attackers
+
+    def estimate_path_damage(self, path, unit_type, num=1, player_index=0):
+        """Estimates what happens to a group of mobile units walking along a path
+
+        Units spend 1 / speed frames on every tile of the path except the last one, where they score or self destruct.
+        Every frame each structure in range of their tile fires one shot at the front unit of the group. A shot only
+        hits one unit, so damage beyond what kills it is lost rather than passed on to the next unit.
+        Each friendly support shields every surviving unit once, on the first tile within its shieldRange.
+        Mobile units on either side are ignored. The shots on each tile are read from the threat maps,
+        so estimating a path costs a lookup per tile once threat_map has been built.
+
+        Args:
+            path: A path, such as one returned by find_path_to_edge
+            unit_type: The type of the mobile units
+            num: The number of units in the group
+            player_index: The index corresponding to the units' owner, 0 for you 1 for the enemy
+
+        Returns:
+            A dict holding one entry per path tile in each of the lists
+            "frames_in_range" (frames spent on the tile while under fire), "damage" (damage taken on the tile)
+            and "survivors" (units still alive when leaving the tile), and the totals
+            "total_frames_in_range" and "total_damage".
+
+        """
+        if unit_type not in ALL_UNITS or is_stationary(unit_type):
+            self._invalid_unit(unit_type)
+            return
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+
+        unit = GameUnit(unit_type, self.config, player_index)
+        frames_per_tile = int(round(1 / unit.speed)) if unit.speed > 0 else 0
+        threat = self.threat_map(player_index)
+        shot_counts = self._threat_maps[2 + player_index]
+        count_mask = (1 << self.SHOT_COUNT_BITS) - 1
+        shields = self.__shields_along_path(path, player_index)
+
+        survivors = num
+        unit_health = unit.max_health
+        front_health = unit.max_health
+        frames_in_range = []
+        damages = []
+        remaining = []
+        for step, (x, y) in enumerate(path):
+            if survivors > 0 and shields[step]:
+                unit_health += shields[step]
+                front_health += shields[step]
+
+            frames = frames_per_tile if step < len(path) - 1 and threat[x][y] > 0 else 0
+            shots = []
+            if frames:
+                counts = shot_counts[x][y]
+                for damage in self._shot_damages:
+                    shots += [damage] * (counts & count_mask)
+                    counts >>= self.SHOT_COUNT_BITS
+            taken = 0
+            for _ in range(frames):
+                for damage in shots:
+                    if survivors <= 0:
+                        break
+                    hit = min(damage, front_health)
+                    taken += hit
+                    front_health -= hit
+                    if front_health <= 0:
+                        survivors -= 1
+                        front_health = unit_health
+            frames_in_range.append(frames)
+            damages.append(taken)
+            remaining.append(survivors)
+
+        return {
+            "frames_in_range": frames_in_range,
+            "damage": damages,
+            "survivors": remaining,
+            "total_frames_in_range": sum(frames_in_range),
+            "total_damage": sum(damages)
+        }
+
+    def __shields_along_path(self, path, player_index):
+        """Gets the shield each unit gains on every tile of a path from the given player's supports
+        """
+        shields = [0] * len(path)
+        game_map = self.game_map
+        for x, y in game_map.mask_locations(game_map.get_structure_mask(player_index)):
+            structure = game_map._structure_spec(x, y)
+            if structure is None:
+                continue
+            spec = structure[0]
+            if spec.shieldRange <= 0 or spec.shieldPerUnit + spec.shieldBonusPerY <= 0:
+                continue
+            rows_forward = y if player_index == 0 else self.ARENA_SIZE - 1 - y
+            for step, location in enumerate(path):
+                if game_map.distance_between_locations([x, y], location) <= spec.shieldRange:
+                    shields[step] += spec.shieldPerUnit + spec.shieldBonusPerY * rows_forward
+                    break
+        return shields
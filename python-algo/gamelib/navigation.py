@@ -1,24 +1,52 @@
 import heapq
-import math
 import sys
-import queue
+from collections import deque
 from .util import debug_write
 
-class Node:
-    """A pathfinding node
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+
+_ARENA_TABLES = {}
+
+def _arena_tables(game_map):
+    """Builds (once per arena size) the lookup tables shared by every pathfinder.
+
+    Tiles are addressed by a flat index, x * ARENA_SIZE + y.
+
+    Returns:
+        A tuple (in_bounds, neighbors, xs, ys). neighbors[i] lists the in bounds tiles adjacent to tile i,
+        in the order up, down, right, left.
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    size = game_map.ARENA_SIZE
+    tables = _ARENA_TABLES.get(size)
+    if tables is not None:
+        return tables
+
+    count = size * size
+    in_bounds = bytearray(count)
+    for x in range(size):
+        for y in range(size):
+            if game_map.in_arena_bounds([x, y]):
+                in_bounds[x * size + y] = 1
+
+    neighbors = []
+    for x in range(size):
+        for y in range(size):
+            adjacent = []
+            for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if 0 <= nx < size and 0 <= ny < size and in_bounds[nx * size + ny]:
+                    adjacent.append(nx * size + ny)
+            neighbors.append(tuple(adjacent))
+
+    xs = tuple(i // size for i in range(count))
+    ys = tuple(i % size for i in range(count))
+    tables = (in_bounds, tuple(neighbors), xs, ys)
+    _ARENA_TABLES[size] = tables
+    return tables
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,29 +56,51 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The search state lives in flat arrays indexed by x * ARENA_SIZE + y which are allocated once
+    and reused by every search. Instead of clearing them, each search bumps a generation counter
+    (epoch) and a tile only counts as blocked or visited if its stamp matches the current epoch.
+
+    With use_numpy the pocket, idealness and distance field searches run as whole array operations, growing
+    boolean masks one step at a time instead of visiting tiles one by one. The path walk itself and the results
+    are the same either way. If NumPy is not installed the flag is ignored.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * use_numpy (bool): Whether the NumPy backend is in use
 
     """
-    def __init__(self):
+    def __init__(self, use_numpy=False):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.use_numpy = use_numpy and np is not None
+        self._size = 0
+        self._epoch = 0
 
     def initialize_map(self, game_state):
         """Initializes the map
 
+        Allocates the search arrays on first use, afterwards just starts a new search generation.
+
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        size = game_state.ARENA_SIZE
+        if self._size != size:
+            self._size = size
+            self._in_bounds, self._neighbors, self._xs, self._ys = _arena_tables(game_state.game_map)
+            count = size * size
+            self._blocked = [0] * count
+            self._visited_idealness = [0] * count
+            self._visited_validate = [0] * count
+            self._pathlength = [-1] * count
+            self._idealness_tables = {}
+        self._epoch += 1
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -65,61 +115,141 @@ class ShortestPathFinder:
             Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
 
         """
-        if game_state.contains_stationary_unit(start_point):
+        if game_state._holds_structure(start_point):
             return
 
-        #Initialize map 
+        #Initialize map
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._fill_walls()
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        self._set_end_points(end_points)
+        start = self._index(start_point)
+        ideal_endpoint = self._idealness_search(start)
+        self._validate(ideal_endpoint, start)
+        return self._get_path(start)
+
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        Every start in the same pocket of pathable space shares the same distance field, so the validation
+        search only runs once per pocket instead of once per start.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A dict mapping each start point, as an (x, y) tuple, to the path navigate_multiple_endpoints would
+            return for it. Starts blocked by a structure map to None.
 
-    def _idealness_search(self, start, end_points):
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        self.initialize_map(game_state)
+        self._fill_walls()
+        self._set_end_points(end_points)
+        epoch = self._epoch
+        blocked = self._blocked
+        validated = self._visited_validate
+
+        paths = {}
+        for start_point in start_points:
+            key = (int(start_point[0]), int(start_point[1]))
+            if key in paths:
+                continue
+            start = self._index(key)
+            if blocked[start] == epoch:
+                paths[key] = None
+                continue
+            # Pockets never touch, so a validated start already has the distance field of its own pocket
+            if not validated[start] == epoch:
+                self._validate(self._idealness_search(start))
+            paths[key] = self._get_path(start)
+        return paths
+
+    def _index(self, location):
+        return int(location[0]) * self._size + int(location[1])
+
+    def _fill_walls(self, wall_indices=None):
+        """Stamps every tile holding a structure as blocked for the current epoch
+
+        Args:
+            wall_indices: Flat indices of the blocked tiles. Read from the game state if None.
+        """
+        epoch = self._epoch
+        blocked = self._blocked
+        if wall_indices is not None:
+            for index in wall_indices:
+                blocked[index] = epoch
+            return
+        mask = self.game_state.game_map.get_structure_mask()
+        while mask:
+            low = mask & -mask
+            blocked[low.bit_length() - 1] = epoch
+            mask ^= low
+
+    def _set_end_points(self, end_points):
+        """Caches the per search information derived from the target edge
+        """
+        self._end_indices = [self._index(location) for location in end_points]
+        self._end_set = set(self._end_indices)
+        self._direction = self._get_direction_from_endpoints(end_points)
+        key = tuple(self._direction)
+        idealness = self._idealness_tables.get(key)
+        if idealness is None:
+            idealness = [self._get_idealness([self._xs[index], self._ys[index]], self._direction) for index in range(len(self._xs))]
+            self._idealness_tables[key] = idealness
+        self._idealness = idealness
+        if self.use_numpy:
+            self._end_mask = np.zeros(len(idealness), dtype=bool)
+            self._end_mask[self._end_indices] = True
+            self._end_mask = self._end_mask.reshape(self._size, self._size)
+            self._idealness_array = np.array(idealness)
+
+    def _idealness_search(self, start):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        if self.use_numpy:
+            return self._idealness_search_numpy(start)
+        epoch = self._epoch
+        blocked = self._blocked
+        visited = self._visited_idealness
+        neighbors = self._neighbors
+        idealness = self._idealness
+        end_set = self._end_set
+
+        if start in end_set:
+            return start
+        best_idealness = idealness[start]
         most_ideal = start
+        visited[start] = epoch
+        current = deque([start])
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            search_location = current.popleft()
+            for neighbor in neighbors[search_location]:
+                if blocked[neighbor] == epoch or visited[neighbor] == epoch:
                     continue
+                # Any endpoint is perfectly ideal, and which one we found does not change the result
+                if neighbor in end_set:
+                    return neighbor
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
-
+                visited[neighbor] = epoch
+                current_idealness = idealness[neighbor]
                 if current_idealness > best_idealness:
                     best_idealness = current_idealness
                     most_ideal = neighbor
-
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                current.append(neighbor)
 
         return most_ideal
 
-    def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
-        """
-        x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
-
     def _get_direction_from_endpoints(self, end_points):
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -134,157 +264,221 @@ class ShortestPathFinder:
             direction[1] = -1
         return direction
 
-    def _get_idealness(self, location, end_points):
-        """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+    def _get_idealness(self, location, direction):
+        """Get the idealness of a tile that is not an endpoint, the reachable tile the unit most wants to path to.
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
-            A location the unit will attempt to reach
+            The idealness of the location when heading in the given direction
         """
-        if location in end_points:
-            return sys.maxsize
-
-        direction = self._get_direction_from_endpoints(end_points)
-
+        last = self._size - 1
         idealness = 0
         if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
+            idealness += self._size * location[1]
+        else:
+            idealness += self._size * (last - location[1])
         if direction[0] == 1:
             idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
+        else:
+            idealness += (last - location[0])
 
         return idealness
 
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, ideal_tile, start=None):
         """Breadth first search of the grid, setting the pathlengths of each node
 
+        If start is given, the search stops as soon as every tile a unit at start could step onto or
+        compare against has its final pathlength.
         """
-        #VALDIATION
+        if self.use_numpy:
+            return self._validate_numpy(ideal_tile, start)
+        epoch = self._epoch
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
+        neighbors = self._neighbors
+
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+        if ideal_tile in self._end_set:
+            sources = self._end_indices
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            sources = [ideal_tile]
+        for location in sources:
+            #Set current pathlength to 0
+            pathlength[location] = 0
+            visited[location] = epoch
+        current = deque(sources)
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        while current:
+            current_location = current.popleft()
+            #Structures on an endpoint get a pathlength but units can't walk through them
+            if blocked[current_location] == epoch:
+                continue
+            current_pathlength = pathlength[current_location]
+            if start is not None and visited[start] == epoch and current_pathlength > pathlength[start]:
+                break
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+            next_pathlength = current_pathlength + 1
+            for neighbor in neighbors[current_location]:
+                if blocked[neighbor] == epoch or visited[neighbor] == epoch:
+                    continue
+                pathlength[neighbor] = next_pathlength
+                visited[neighbor] = epoch
+                current.append(neighbor)
 
-        #debug_write("Print after validate")
-        #self.print_map()
-        return
+    def _passable_numpy(self):
+        """Boolean mask, shaped [x, y], of the in bounds tiles without a structure
+        """
+        blocked = np.array(self._blocked).reshape(self._size, self._size) == self._epoch
+        in_bounds = np.frombuffer(self._in_bounds, dtype=np.uint8).reshape(self._size, self._size).astype(bool)
+        return in_bounds & ~blocked
 
-    def _get_path(self, start_point, end_points):
+    def _dilate_numpy(self, mask):
+        """Grows a boolean mask by one step in each of the four directions
+        """
+        grown = mask.copy()
+        grown[1:, :] |= mask[:-1, :]
+        grown[:-1, :] |= mask[1:, :]
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        return grown
+
+    def _idealness_search_numpy(self, start):
+        """Whole array version of _idealness_search. Grows the pocket around start until it stops changing,
+        then picks any endpoint in it or else its most ideal tile, which is unique since no two tiles share an idealness.
+        """
+        if start in self._end_set:
+            return start
+        passable = self._passable_numpy()
+        pocket = np.zeros_like(passable)
+        pocket[start // self._size, start % self._size] = True
+        while True:
+            grown = self._dilate_numpy(pocket) & passable
+            grown[start // self._size, start % self._size] = True
+            if (grown == pocket).all():
+                break
+            pocket = grown
+
+        reachable_ends = np.flatnonzero(pocket & self._end_mask)
+        if len(reachable_ends):
+            return int(reachable_ends[0])
+        idealness = np.where(pocket.ravel(), self._idealness_array, -1)
+        return int(np.argmax(idealness))
+
+    def _validate_numpy(self, ideal_tile, start=None):
+        """Whole array version of _validate. Each step labels the ring of tiles one further from the sources.
+        """
+        passable = self._passable_numpy()
+        size = self._size
+        visited = np.zeros((size, size), dtype=bool)
+        if ideal_tile in self._end_set:
+            visited |= self._end_mask
+        else:
+            visited[ideal_tile // size, ideal_tile % size] = True
+        pathlength = np.where(visited, 0, -1)
+        #Structures on an endpoint get a pathlength but units can't walk through them
+        frontier = visited & passable
+
+        level = 0
+        while frontier.any():
+            if start is not None and visited[start // size, start % size] and level > pathlength[start // size, start % size]:
+                break
+            frontier = self._dilate_numpy(frontier) & passable & ~visited
+            level += 1
+            pathlength[frontier] = level
+            visited |= frontier
+
+        # merged into the existing lists in place, so tiles of pockets validated earlier this epoch keep their
+        # pathlengths and callers holding the lists see the update
+        visited = visited.ravel()
+        self._pathlength[:] = np.where(visited, pathlength.ravel(), self._pathlength).tolist()
+        self._visited_validate[:] = np.where(visited, self._epoch, self._visited_validate).tolist()
+
+    def _get_path(self, start):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
-        #GET THE PATH
-        path = [start_point]
-        current = start_point
+        size = self._size
+        pathlength = self._pathlength
+        path = [[start // size, start % size]]
+        current = start
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction)
 
-            if current[0] == next_move[0]:
+            if current // size == next_move // size:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append([next_move // size, next_move % size])
             current = next_move
-        
-        #debug_write(path)
+
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        epoch = self._epoch
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point]
+        for neighbor in self._neighbors[current_point]:
+            # Tiles the validation step never reached are further away than anything we are comparing
+            if blocked[neighbor] == epoch or not visited[neighbor] == epoch:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
+        xs, ys = self._xs, self._ys
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not xs[new_tile] == xs[prev_best]:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
+            if ys[prev_tile] == ys[new_tile]:
+                return False
             return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
+        if previous_move_direction == self.VERTICAL and not ys[new_tile] == ys[prev_best]:
+            if xs[prev_tile] == xs[new_tile]:
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if ys[prev_tile] == ys[new_tile]:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
+
+        #To make it here, both moves are on the same axis
+        direction = self._direction
+        if ys[new_tile] == ys[prev_best]: #If they both moved horizontal...
+            if direction[0] == 1 and xs[new_tile] > xs[prev_best]: #If we moved right and right is our direction, we moved towards our direction
+                return True
+            if direction[0] == -1 and xs[new_tile] < xs[prev_best]: #If we moved left and left is our direction, we moved towards our direction
+                return True
+            return False
+        if xs[new_tile] == xs[prev_best]: #If they both moved vertical...
+            if direction[1] == 1 and ys[new_tile] > ys[prev_best]: #If we moved up and up is our direction, we moved towards our direction
                 return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
+            if direction[1] == -1 and ys[new_tile] < ys[prev_best]: #If we moved down and down is our direction, we moved towards our direction
                 return True
             return False
         return True
@@ -297,11 +491,12 @@ class ShortestPathFinder:
             debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
             return
 
-        for y in range(28):
-            for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+        size = self._size
+        for y in range(size):
+            for x in range(size):
+                index = x * size + (size - y - 1)
+                if not self._blocked[index] == self._epoch and self._visited_validate[index] == self._epoch:
+                    self._print_justified(self._pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -314,3 +509,272 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class DynamicShortestPathFinder(ShortestPathFinder):
+    """Keeps the distance field toward one set of endpoints up to date as single tiles are blocked or unblocked
+
+    reset() runs one full search toward the endpoints. Afterwards set_blocked() only repairs the tiles whose
+    distance actually changed: unblocking a tile spreads the shorter distances outward from it, blocking a tile
+    collects the tiles that lost every shortest route and relabels just those from their unaffected border.
+    Paths read from the field are identical to the ones ShortestPathFinder computes from scratch.
+
+    Starts in a pocket that cannot reach any endpoint fall back to a from scratch self destruct search of that pocket.
+
+    Attributes :
+        * verify (bool): If true, every navigate call also runs the from scratch search and raises an AssertionError if
+          either the path or the distance field differ. Slow, meant for testing.
+
+    """
+    RESET_THRESHOLD = 48
+
+    def __init__(self, verify=False, use_numpy=False):
+        super().__init__(use_numpy)
+        self.verify = verify
+        self._walls = set()
+        self._end_points = None
+        self._signature = None
+
+    def reset(self, game_state, end_points):
+        """Computes the distance field toward end_points from scratch
+
+        Args:
+            * game_state: The game state whose structures block the field
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        self.initialize_map(game_state)
+        self._fill_walls()
+        epoch = self._epoch
+        self._walls = {index for index, stamp in enumerate(self._blocked) if stamp == epoch}
+        self._signature = game_state.game_map.get_obstruction_signature()
+        self._end_points = [list(location) for location in end_points]
+        self._set_end_points(self._end_points)
+        self._validate(self._end_indices[0])
+
+    def sync(self, game_state):
+        """Brings the field up to date with the structures currently on game_state's map
+
+        Args:
+            * game_state: The game state to match. May be a different state than the one passed to reset
+
+        """
+        self.game_state = game_state
+        signature = game_state.game_map.get_obstruction_signature()
+        changed = signature ^ self._signature
+        if bin(changed).count("1") > self.RESET_THRESHOLD:
+            # Repairing this many tiles one at a time costs more than starting over
+            self.reset(game_state, self._end_points)
+            return
+        while changed:
+            low_bit = changed & -changed
+            index = low_bit.bit_length() - 1
+            self._set_blocked_index(index, bool(signature & low_bit))
+            changed ^= low_bit
+        self._signature = signature
+
+    def set_blocked(self, location, blocked=True):
+        """Blocks or unblocks a single tile and repairs the distance field
+
+        This does not change the game state, so it can be used to try out hypothetical structures.
+        Call it again with blocked=False to undo the change.
+
+        Args:
+            * location: The location of the tile
+            * blocked: True if the tile now holds a structure, False if it is empty
+
+        """
+        index = self._index(location)
+        self._set_blocked_index(index, blocked)
+        if blocked:
+            self._signature |= 1 << index
+        else:
+            self._signature &= ~(1 << index)
+
+    def navigate(self, start_point):
+        """Gets the path a unit at start_point would take with the current field
+
+        Args:
+            * start_point: The starting location of the unit
+
+        Returns:
+            The path as a list of locations, or None if start_point is blocked
+
+        """
+        start = self._index(start_point)
+        if start in self._walls:
+            return
+        if self._visited_validate[start] == self._epoch:
+            path = self._get_path(start)
+        else:
+            path = self._scratch_path(start_point)
+        if self.verify:
+            self._verify(start_point, path)
+        return path
+
+    def prepare(self, game_state, end_points):
+        """Makes the field match game_state and end_points, repairing it if only the structures changed
+
+        Args:
+            * game_state: The game state to match
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        if self._end_points is None or self._size != game_state.ARENA_SIZE or [list(location) for location in end_points] != self._end_points:
+            self.reset(game_state, end_points)
+        else:
+            self.sync(game_state)
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state):
+        """Drop in replacement for ShortestPathFinder.navigate_multiple_endpoints that reuses the field between calls
+        """
+        self.prepare(game_state, end_points)
+        return self.navigate(start_point)
+
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Drop in replacement for ShortestPathFinder.navigate_multiple_starts that reuses the field between calls
+        """
+        paths = {}
+        for start_point in start_points:
+            key = (int(start_point[0]), int(start_point[1]))
+            if key not in paths:
+                paths[key] = self.navigate_multiple_endpoints(key, end_points, game_state)
+        return paths
+
+    def _set_blocked_index(self, index, blocked):
+        if blocked == (index in self._walls):
+            return
+        if blocked:
+            self._walls.add(index)
+            self._block(index)
+        else:
+            self._walls.discard(index)
+            self._unblock(index)
+
+    def _unblock(self, index):
+        epoch = self._epoch
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
+        neighbors = self._neighbors
+
+        blocked[index] = 0
+        visited[index] = 0
+        if index in self._end_set:
+            best = 0
+        else:
+            best = -1
+            for neighbor in neighbors[index]:
+                if not blocked[neighbor] == epoch and visited[neighbor] == epoch and (best == -1 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if best == -1:
+                # Still cut off from every endpoint
+                return
+        pathlength[index] = best
+        visited[index] = epoch
+
+        # Shorter distances spread outward from the opened tile
+        current = deque([index])
+        while current:
+            location = current.popleft()
+            next_pathlength = pathlength[location] + 1
+            for neighbor in neighbors[location]:
+                if blocked[neighbor] == epoch:
+                    continue
+                if not visited[neighbor] == epoch or pathlength[neighbor] > next_pathlength:
+                    pathlength[neighbor] = next_pathlength
+                    visited[neighbor] = epoch
+                    current.append(neighbor)
+
+    def _block(self, index):
+        epoch = self._epoch
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
+        neighbors = self._neighbors
+
+        blocked[index] = epoch
+        if not visited[index] == epoch:
+            return
+        visited[index] = 0
+        lost_pathlength = pathlength[index] + 1
+
+        # Collect, level by level, the tiles left without any neighbor one step closer to an endpoint
+        affected = set()
+        current = deque(neighbor for neighbor in neighbors[index]
+                        if not blocked[neighbor] == epoch and visited[neighbor] == epoch and pathlength[neighbor] == lost_pathlength)
+        while current:
+            location = current.popleft()
+            if location in affected:
+                continue
+            supported_pathlength = pathlength[location] - 1
+            supported = False
+            for neighbor in neighbors[location]:
+                if not blocked[neighbor] == epoch and visited[neighbor] == epoch and neighbor not in affected and pathlength[neighbor] == supported_pathlength:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(location)
+            dependent_pathlength = pathlength[location] + 1
+            for neighbor in neighbors[location]:
+                if not blocked[neighbor] == epoch and visited[neighbor] == epoch and neighbor not in affected and pathlength[neighbor] == dependent_pathlength:
+                    current.append(neighbor)
+
+        if not affected:
+            return
+
+        # Relabel the affected region from its border with the rest of the field
+        for location in affected:
+            visited[location] = 0
+        frontier = []
+        for location in affected:
+            best = -1
+            for neighbor in neighbors[location]:
+                if not blocked[neighbor] == epoch and visited[neighbor] == epoch and (best == -1 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if not best == -1:
+                frontier.append((best, location))
+        heapq.heapify(frontier)
+        while frontier:
+            location_pathlength, location = heapq.heappop(frontier)
+            if visited[location] == epoch:
+                continue
+            pathlength[location] = location_pathlength
+            visited[location] = epoch
+            for neighbor in neighbors[location]:
+                if neighbor in affected and not visited[neighbor] == epoch:
+                    heapq.heappush(frontier, (location_pathlength + 1, neighbor))
+
+    def _scratch_finder(self, use_numpy=None):
+        """A plain ShortestPathFinder set up with this finder's walls and endpoints
+        """
+        finder = ShortestPathFinder(self.use_numpy if use_numpy is None else use_numpy)
+        finder.initialize_map(self.game_state)
+        finder._fill_walls(self._walls)
+        finder._set_end_points(self._end_points)
+        return finder
+
+    def _scratch_path(self, start_point):
+        finder = self._scratch_finder()
+        start = finder._index(start_point)
+        finder._validate(finder._idealness_search(start), start)
+        return finder._get_path(start)
+
+    def _verify(self, start_point, path):
+        finder = self._scratch_finder(use_numpy=False)
+        start = finder._index(start_point)
+        ideal_tile = finder._idealness_search(start)
+        finder._validate(ideal_tile)
+        expected = finder._get_path(start)
+        if not expected == path:
+            raise AssertionError("Incremental path from {} is {}, from scratch it is {}".format(start_point, path, expected))
+
+        if ideal_tile in finder._end_set:
+            for index in range(len(self._pathlength)):
+                if index in self._walls:
+                    continue
+                actual = self._pathlength[index] if self._visited_validate[index] == self._epoch else -1
+                wanted = finder._pathlength[index] if finder._visited_validate[index] == finder._epoch else -1
+                if not actual == wanted:
+                    raise AssertionError("Incremental pathlength at {} is {}, from scratch it is {}".format([self._xs[index], self._ys[index]], actual, wanted))
@@ -0,0 +1,327 @@
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+
+from .game_state import GameState
+from .simulator import BatchSimulator
+from .unit import GameUnit
+from .util import debug_write
+
+
+Plan = namedtuple("Plan", ["build", "deploy"])
+Plan.__doc__ = """A candidate turn: structures to build, then mobile units to deploy
+
+    * build: A tuple of (unit_type, [x, y]) structures, placed in order with attempt_spawn
+    * deploy: A tuple of (unit_type, [x, y], num) mobile units, deployed in order with attempt_spawn
+"""
+
+
+def default_score(summary):
+    """Scores a simulated action phase by the damage it deals to the enemy, health first"""
+    return (summary["player_damage"], summary["structure_damage"])
+
+
+_worker_config = None
+_worker_generation = None
+
+def _init_worker(config, generation=None):
+    global _worker_config, _worker_generation
+    _worker_config = config
+    _worker_generation = generation
+
+
+def _unit_rows(game_state):
+    table = game_state.game_map.unit_table()
+    shorthands = {code: shorthand for shorthand, code in table.codes.items()}
+    return [(shorthands[int(code)], int(player_index), float(health), int(x), int(y), bool(upgraded), bool(pending_removal))
+            for x, y, code, player_index, health, upgraded, pending_removal
+            in zip(table.x, table.y, table.type, table.player_index, table.health, table.upgraded, table.pending_removal)]
+
+
+def _tiles(rows):
+    tiles = {}
+    for row in rows:
+        tiles.setdefault((row[3], row[4]), []).append(row)
+    return tiles
+
+
+def _snapshot(game_state):
+    """Gets what a worker needs to rebuild a game state: every unit on its map, its resources and its stacks
+
+    The units are read from the map rather than replayed from the stacks, so changes made through the game_map
+    directly reach the workers too.
+    """
+    resources = [dict(resources) for resources in game_state._player_resources]
+    return _unit_rows(game_state), resources, list(game_state._build_stack), list(game_state._deploy_stack)
+
+
+def _restore(config, serialized_string, snapshot):
+    units, resources, build_stack, deploy_stack = snapshot
+    game_state = GameState(config, serialized_string)
+    game_state.suppress_warnings(True)
+    game_map = game_state.game_map
+    # most tiles are as parsed, only the ones changed since are rebuilt
+    parsed = _tiles(_unit_rows(game_state))
+    wanted = _tiles(units)
+    for x, y in parsed.keys() | wanted.keys():
+        rows = wanted.get((x, y))
+        if rows == parsed.get((x, y)):
+            continue
+        game_map.remove_unit([x, y])
+        for unit_type, player_index, health, _, _, upgraded, pending_removal in rows or ():
+            unit = GameUnit(unit_type, config, player_index, None, x, y)
+            if upgraded:
+                unit.upgrade()
+            unit.health = health
+            unit.pending_removal = pending_removal
+            game_map._place_unit(unit)
+    game_state._player_resources = resources
+    game_state._build_stack = build_stack
+    game_state._deploy_stack = deploy_stack
+    return game_state
+
+
+def _evaluate(task, config=None):
+    """Simulates every deploy of one build on a fresh copy of the turn
+
+    task is (serialized_string, snapshot, build, deploys, generation), with the snapshot from _snapshot.
+    Returns the seconds taken and one summary per deploy, or None for deploys that cannot be afforded after the build.
+    Returns None without simulating anything if the search that queued the task has ended.
+    """
+    serialized_string, snapshot, build, deploys, generation = task
+    if _worker_generation is not None and _worker_generation.value != generation:
+        return None
+    start = time.perf_counter()
+    game_state = _restore(config or _worker_config, serialized_string, snapshot)
+    summaries = _evaluate_build(game_state, build, deploys)
+    return time.perf_counter() - start, summaries
+
+
+def _evaluate_build(game_state, build, deploys):
+    for unit_type, location in build:
+        game_state.attempt_spawn(unit_type, location)
+
+    affordable = []
+    for deploy in deploys:
+        mp = sum(game_state.type_cost(unit_type)[game_state.MP] * num for unit_type, location, num in deploy)
+        affordable.append(mp <= game_state.get_resource(game_state.MP) and
+                          all(game_state.can_spawn(unit_type, location, num) for unit_type, location, num in deploy))
+    summaries = BatchSimulator(game_state, [deploy for deploy, ok in zip(deploys, affordable) if ok]).run()
+    summaries.reverse()
+    return [summaries.pop() if ok else None for ok in affordable]
+
+
+class PlanSearch:
+    """Searches build and deploy plans for the one whose simulated action phase scores best, within a deadline
+
+    Create it in on_game_start, so the worker processes are forked once with the config instead of every turn.
+    By default plans are scored in this process, since the competition runner gives the algo a single core;
+    pass processes to use a worker pool where more cores are available.
+    Each search first scores the given candidate plans, then keeps sampling random combinations of their builds
+    and deploys until the deadline, and returns the best plan seen. Plans are scored one build at a time with BatchSimulator,
+    against the current structures, including ones changed through the game_map directly; enemy mobile units are not simulated.
+    No batch is queued that the recent batch times say can't finish before the deadline, and batches a search
+    leaves queued when it ends are skipped by the workers, so they don't eat into the next search.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * time_budget (float): Seconds a search may take by default. Derived from timingAndReplay.waitTimeBotSoft.
+        * processes (int): The number of worker processes, 0 to evaluate in this process
+        * evaluated (int): The number of plans scored by the last search
+        * batch_seconds (float): How long scoring one batch took lately, used to stop queueing batches that can't finish in time
+
+    """
+    TIME_FRACTION = 0.5
+    BATCH_SIZE = 8
+
+    def __init__(self, config, processes=0, time_fraction=None):
+        """Reads the time limit from the config and forks the worker pool
+
+        Args:
+            config (JSON): The config passed to on_game_start
+            processes: The number of worker processes. Defaults to 0, scoring plans in this process.
+            time_fraction: The fraction of waitTimeBotSoft a search may take. Defaults to TIME_FRACTION.
+
+        """
+        self.config = config
+        fraction = self.TIME_FRACTION if time_fraction is None else time_fraction
+        soft_limit = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000)
+        self.time_budget = soft_limit / 1000 * fraction
+        self.processes = processes
+        self.evaluated = 0
+        self.batch_seconds = 0.0
+        self._pool = None
+        self._generation = None
+        self._outstanding = []
+        if processes > 0:
+            try:
+                context = multiprocessing.get_context("fork")
+            except ValueError:
+                debug_write("Forking is not available, plans will be searched without a worker pool")
+                self.processes = 0
+            else:
+                # bumped when a search ends, so workers skip the tasks it left queued
+                self._generation = context.Value("i", 0)
+                self._pool = context.Pool(processes, initializer=_init_worker, initargs=(config, self._generation))
+
+    def candidate_plans(self, game_state, builds=None, unit_types=None, locations=None):
+        """Generates a plan for every build combined with every mobile unit type sent from every location
+
+        Each deploy sends as many units of one type as can be afforded, or half as many.
+
+        Args:
+            game_state: The GameState to plan for
+            builds: A list of structure lists, each (unit_type, [x, y]) pairs. Defaults to building nothing.
+            unit_types: The mobile unit types to try. Defaults to SCOUT and DEMOLISHER.
+            locations: The locations to deploy from. Defaults to every free friendly edge location.
+
+        Returns:
+            A list of Plans
+
+        """
+        unit_information = game_state.config["unitInformation"]
+        if unit_types is None:
+            unit_types = [unit_information[3]["shorthand"], unit_information[4]["shorthand"]]
+        if locations is None:
+            edges = game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_LEFT) + game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_RIGHT)
+            locations = [location for location in edges if not game_state._holds_structure(location)]
+
+        deploys = [()]
+        for unit_type in unit_types:
+            affordable = int(game_state.number_affordable(unit_type))
+            for num in sorted(set([affordable, affordable // 2])):
+                if num > 0:
+                    deploys.extend(((unit_type, list(location), num),) for location in locations)
+
+        plans = []
+        for build in builds or [()]:
+            for deploy in deploys:
+                plans.append(Plan(tuple((unit_type, list(location)) for unit_type, location in build), deploy))
+        return plans
+
+    def search(self, game_state, plans, score=default_score, deadline=None, rng=None):
+        """Scores plans until they run out or the deadline passes, and returns the best one
+
+        Args:
+            game_state: The GameState to plan for. Its pending builds and deploys are kept under every plan.
+            plans: The Plans to try first, for example from candidate_plans
+            score: A function from an ActionSimulator.summary dict to a comparable score
+            deadline: A time.perf_counter() value to stop at. Defaults to time_budget seconds from now.
+            rng: The random.Random used to sample more plans once the given ones are scored
+
+        Returns:
+            A tuple (plan, summary) of the best plan found and its summary, or (None, None) if no plan could be scored
+
+        """
+        if deadline is None:
+            deadline = time.perf_counter() + self.time_budget
+        rng = rng or random.Random()
+        builds = list({self._key(plan)[0]: plan.build for plan in plans}.values())
+        deploys = list({self._key(plan)[1]: plan.deploy for plan in plans}.values())
+        seen = set()
+        queue = []
+        for plan in plans:
+            key = self._key(plan)
+            if key not in seen:
+                seen.add(key)
+                queue.append(plan)
+
+        best_plan, best_summary, best_score = None, None, None
+        self.evaluated = 0
+        # tasks of earlier searches still running hold a worker until they finish, queued ones are skipped
+        self._outstanding = [result for result in self._outstanding if not result.ready()]
+        generation = None if self._generation is None else self._generation.value
+        snapshot = None if self._pool is None else _snapshot(game_state)
+        pending = []
+        try:
+            while time.perf_counter() < deadline:
+                # keep every worker busy with a batch of plans sharing a build, unless it can't finish before the deadline
+                while len(pending) < max(self.processes, 1) * 2 and time.perf_counter() + self.batch_seconds < deadline:
+                    batch = self._next_batch(queue, builds, deploys, seen, rng)
+                    if not batch:
+                        break
+                    if self._pool is None:
+                        # a fork already holds the pending builds and deploys, so nothing is parsed or replayed
+                        start = time.perf_counter()
+                        child = game_state.fork()
+                        child.suppress_warnings(True)
+                        summaries = _evaluate_build(child, batch[0].build, [plan.deploy for plan in batch])
+                        pending.append((batch, (time.perf_counter() - start, summaries)))
+                        break
+                    task = (game_state.serialized_string, snapshot, batch[0].build, [plan.deploy for plan in batch], generation)
+                    pending.append((batch, self._pool.apply_async(_evaluate, (task,))))
+                if not pending:
+                    break
+
+                batch, result = pending.pop(0)
+                if self._pool is not None:
+                    remaining = max(deadline - time.perf_counter(), 0)
+                    try:
+                        result = result.get(None if remaining == float("inf") else remaining)
+                    except multiprocessing.TimeoutError:
+                        break
+                seconds, summaries = result
+                self.batch_seconds = seconds if not self.batch_seconds else 0.5 * (self.batch_seconds + seconds)
+                for plan, summary in zip(batch, summaries):
+                    self.evaluated += 1
+                    if summary is None:
+                        continue
+                    plan_score = score(summary)
+                    if best_score is None or plan_score > best_score:
+                        best_plan, best_summary, best_score = plan, summary, plan_score
+        finally:
+            if self._generation is not None:
+                with self._generation.get_lock():
+                    self._generation.value += 1
+                self._outstanding += [result for batch, result in pending]
+        return best_plan, best_summary
+
+    def _next_batch(self, queue, builds, deploys, seen, rng):
+        if queue:
+            build = queue[0].build
+            batch = [plan for plan in queue if plan.build == build][:self.BATCH_SIZE]
+            for plan in batch:
+                queue.remove(plan)
+            return batch
+
+        # rollouts: random builds with random deploys not tried yet
+        if not builds:
+            return []
+        build = rng.choice(builds)
+        batch = []
+        for _ in range(self.BATCH_SIZE * 4):
+            plan = Plan(build, rng.choice(deploys))
+            key = self._key(plan)
+            if key not in seen:
+                seen.add(key)
+                batch.append(plan)
+                if len(batch) == self.BATCH_SIZE:
+                    break
+        return batch
+
+    @staticmethod
+    def _key(plan):
+        return (tuple((unit_type, tuple(location)) for unit_type, location in plan.build),
+                tuple((unit_type, tuple(location), num) for unit_type, location, num in plan.deploy))
+
+    @staticmethod
+    def apply_plan(game_state, plan):
+        """Builds and deploys a plan for real with attempt_spawn
+
+        Args:
+            game_state: The GameState to submit the plan with
+            plan: A Plan, such as the one returned by search
+
+        """
+        for unit_type, location in plan.build:
+            game_state.attempt_spawn(unit_type, location)
+        for unit_type, location, num in plan.deploy:
+            game_state.attempt_spawn(unit_type, location, num)
+
+    def close(self):
+        """Stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
@@ -0,0 +1,694 @@
+import math
+
+from .unit import GameUnit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SimulatedUnit:
+    """A unit taking part in a simulated action phase
+
+    Holds a copy of the stats of a GameUnit, so simulating never changes the units of the game state.
+
+    Attributes :
+        * unit_type (string): This unit's type
+        * player_index (integer): The player that controls this unit. 0 for you, 1 for your opponent.
+        * x (integer): The x coordinate of the unit
+        * y (integer): The y coordinate of the unit
+        * health (float): The current health of this unit
+        * stationary (bool): Whether or not this unit is a structure
+        * target_edge (int): The edge a mobile unit is walking toward
+        * steps (int): The number of tiles a mobile unit has moved
+
+    """
+    __slots__ = ("unit_type", "player_index", "x", "y", "health", "stationary", "speed", "damage_f", "damage_i",
+                 "attackRange", "shieldRange", "shield", "breach_damage", "breach_sp", "self_destruct_damage_f",
+                 "self_destruct_damage_i", "self_destruct_range", "self_destruct_steps", "target_edge", "steps",
+                 "frames_to_move", "path", "path_index", "shielded_by", "source")
+
+    def __init__(self, unit, type_config, arena_size):
+        self.unit_type = unit.unit_type
+        self.player_index = unit.player_index
+        self.x = unit.x
+        self.y = unit.y
+        self.health = unit.health
+        self.stationary = unit.stationary
+        self.speed = unit.speed
+        self.damage_f = unit.damage_f
+        self.damage_i = unit.damage_i
+        self.attackRange = unit.attackRange
+        self.shieldRange = unit.shieldRange
+        rows_forward = unit.y if unit.player_index == 0 else arena_size - 1 - unit.y
+        self.shield = unit.shieldPerUnit + unit.shieldBonusPerY * rows_forward
+        self.breach_damage = type_config.get("playerBreachDamage", 0)
+        self.breach_sp = type_config.get("metalForBreach", 0)
+        self.self_destruct_damage_f = type_config.get("selfDestructDamageTower", 0)
+        self.self_destruct_damage_i = type_config.get("selfDestructDamageWalker", 0)
+        self.self_destruct_range = type_config.get("selfDestructRange", 0)
+        self.self_destruct_steps = type_config.get("selfDestructStepsRequired", 0)
+        self.target_edge = None
+        self.steps = 0
+        self.frames_to_move = int(round(1 / unit.speed)) if unit.speed > 0 else 0
+        self.path = None
+        self.path_index = 0
+        self.shielded_by = set()
+        self.source = unit
+
+    def __repr__(self):
+        owner = "Friendly" if self.player_index == 0 else "Enemy"
+        return "Simulated {} {}, health: {} location: {}".format(owner, self.unit_type, self.health, [self.x, self.y])
+
+
+class ActionSimulator:
+    """Simulates an action phase frame by frame, without the game engine
+
+    The simulation starts from a GameState after the deploy phase: the structures on its map (including the ones
+    placed with attempt_spawn and upgraded with attempt_upgrade) and the mobile units in its pending deploy stack.
+    Enemy mobile units can be added with add_unit before running. Nothing in the game state is modified.
+
+    Each frame follows the engine's order:
+        1. Supports shield every mobile unit in range they have not shielded yet.
+        2. Mobile units whose move timer ran out take one step along their path. A unit that reaches a tile of
+           its target edge breaches. A unit at the end of a path that does not reach its edge self destructs,
+           dealing damage only if it has moved at least selfDestructStepsRequired tiles.
+        3. Every unit with a target attacks once, targeting as documented in GameState.get_target.
+           Damage is applied immediately and units at 0 health can no longer attack or be targeted.
+        4. Units at 0 health are removed. Paths are recomputed from the current tile if a structure was destroyed.
+
+    The action phase ends once no mobile units are left.
+
+    Attributes :
+        * frame (int): The number of frames simulated so far
+        * units (list): The SimulatedUnits still on the board, structures first
+        * health ([float, float]): The remaining health of you and your opponent
+        * sp_gained ([float, float]): The SP each player earned from breaches
+        * breaches (list): One (location, damage, unit_type, player_index) tuple per breach
+        * self_destructs (list): One (location, damage_f, damage_i, unit_type, player_index) tuple per self destruct
+        * destroyed (list): The SimulatedUnits that died, in order
+
+    """
+    MAX_FRAMES = 1000
+
+    def __init__(self, game_state, include_deploy_stack=True):
+        """Sets up the simulation from a game state
+
+        Args:
+            game_state: The GameState to simulate the action phase of
+            include_deploy_stack: If false, the mobile units waiting in the deploy stack are left out
+
+        """
+        self.game_state = game_state
+        self.game_map = game_state.game_map
+        self.config = game_state.config
+        self._type_configs = {info.get("shorthand"): info for info in self.config["unitInformation"]}
+        self._hit_radius = self.config["unitInformation"][0].get("getHitRadius", 0)
+        self._size = game_state.ARENA_SIZE
+
+        self.frame = 0
+        self.health = [game_state.my_health, game_state.enemy_health]
+        self.sp_gained = [0, 0]
+        self.breaches = []
+        self.self_destructs = []
+        self.destroyed = []
+
+        self._structures = {}
+        self._mobile = []
+        self._deployed = [0, 0]
+        self._edges = [set((x, y) for x, y in edge) for edge in self.game_map.get_edges()]
+        self._finders = {}
+        self._opened = []
+        for x, y in self.game_map.mask_locations(self.game_map.get_structure_mask()):
+            for unit in self.game_map[x, y]:
+                if unit.stationary:
+                    self._structures[(x, y)] = SimulatedUnit(unit, self._type_configs[unit.unit_type], self._size)
+        if include_deploy_stack:
+            for unit_type, x, y in game_state._deploy_stack:
+                self.add_unit(unit_type, [x, y], 0)
+
+    @property
+    def units(self):
+        return list(self._structures.values()) + self._mobile
+
+    def add_unit(self, unit_type, location, player_index=1):
+        """Adds a mobile unit to the start of the action phase, usually to try out an enemy deploy
+
+        Args:
+            unit_type: The type of the mobile unit
+            location: The location it is spawned at
+            player_index: The index corresponding to the unit's owner, 0 for you 1 for the enemy
+
+        Returns:
+            The new SimulatedUnit, or None if unit_type is a structure
+
+        """
+        x, y = int(location[0]), int(location[1])
+        unit = SimulatedUnit(GameUnit(unit_type, self.config, player_index, None, x, y), self._type_configs[unit_type], self._size)
+        if unit.stationary:
+            self.warn("simulated_structure", unit_type)
+            return
+        unit.target_edge = self.game_state.get_target_edge([x, y])
+        self._mobile.append(unit)
+        self._deployed[unit.player_index] += 1
+        return unit
+
+    def run(self, max_frames=None):
+        """Simulates frames until no mobile units are left
+
+        Args:
+            max_frames: The most frames to simulate. Defaults to MAX_FRAMES.
+
+        Returns:
+            The simulator itself, so results can be read right away
+
+        """
+        limit = self.MAX_FRAMES if max_frames is None else max_frames
+        try:
+            while self._mobile and self.frame < limit:
+                self.step()
+        finally:
+            self.close()
+        return self
+
+    def step(self):
+        """Simulates a single frame
+
+        Returns:
+            True if mobile units are left after the frame, False once the action phase is over
+
+        """
+        if not self._mobile:
+            return False
+        self.frame += 1
+        self._shield()
+        self._move()
+        self._attack()
+        self._remove_dead()
+        return len(self._mobile) > 0
+
+    def summary(self, player_index=0):
+        """Sums up how the action phase went for one player's mobile units
+
+        Args:
+            player_index: The index corresponding to the attacking player, 0 for you 1 for the enemy
+
+        Returns:
+            A dict with the number of "breaches", the "player_damage" they dealt and the "sp_gained" from them,
+            the "structure_damage" dealt to and "structures_destroyed" of the other player, the "survivors"
+            (units that breached or self destructed instead of being destroyed) and the number of "frames" simulated.
+
+        """
+        structure_damage = 0
+        structures_destroyed = 0
+        for unit in list(self._structures.values()) + self.destroyed:
+            if unit.stationary and unit.player_index != player_index:
+                structure_damage += unit.source.health - max(unit.health, 0)
+                structures_destroyed += unit.health <= 0
+        breaches = [breach for breach in self.breaches if breach[3] == player_index]
+        killed = len([unit for unit in self.destroyed if not unit.stationary and unit.player_index == player_index])
+        return {
+            "breaches": len(breaches),
+            "player_damage": sum(breach[1] for breach in breaches),
+            "sp_gained": self.sp_gained[player_index],
+            "structure_damage": structure_damage,
+            "structures_destroyed": structures_destroyed,
+            "survivors": self._deployed[player_index] - killed,
+            "frames": self.frame
+        }
+
+    def close(self):
+        """Puts destroyed structures back into the game state's shared pathfinders
+
+        run() calls this when it finishes. Call it yourself after driving the simulation with step().
+        """
+        for finder, location in reversed(self._opened):
+            finder.set_blocked(location, True)
+        self._opened = []
+
+    def _shield(self):
+        for support in self._structures.values():
+            if support.shieldRange <= 0 or support.shield <= 0 or support.health <= 0:
+                continue
+            for unit in self._mobile:
+                if unit.player_index == support.player_index and support not in unit.shielded_by and unit.health > 0 \
+                        and self._in_range(support, unit, support.shieldRange):
+                    unit.health += support.shield
+                    unit.shielded_by.add(support)
+
+    def _move(self):
+        for unit in self._mobile:
+            if unit.health <= 0 or unit.frames_to_move <= 0:
+                continue
+            unit.frames_to_move -= 1
+            if unit.frames_to_move > 0:
+                continue
+            unit.frames_to_move = int(round(1 / unit.speed))
+
+            if unit.path is None:
+                unit.path = self._finder(unit.target_edge).navigate([unit.x, unit.y])
+                unit.path_index = 0
+            if unit.path is None or unit.path_index + 1 >= len(unit.path):
+                self._self_destruct(unit)
+                continue
+
+            unit.path_index += 1
+            unit.x, unit.y = unit.path[unit.path_index]
+            unit.steps += 1
+            if (unit.x, unit.y) in self._edges[unit.target_edge]:
+                self._breach(unit)
+
+    def _attack(self):
+        for attacker in list(self._structures.values()) + self._mobile:
+            if attacker.health <= 0 or attacker.damage_f + attacker.damage_i <= 0:
+                continue
+            target = self._get_target(attacker)
+            if target is not None:
+                target.health -= attacker.damage_f if target.stationary else attacker.damage_i
+
+    def _remove_dead(self):
+        for location, unit in list(self._structures.items()):
+            if unit.health <= 0:
+                del self._structures[location]
+                self.destroyed.append(unit)
+                for finder in self._finders.values():
+                    self._open(finder, location)
+                for mobile in self._mobile:
+                    mobile.path = None
+        alive = []
+        for unit in self._mobile:
+            if unit.health > 0:
+                alive.append(unit)
+            elif unit.frames_to_move >= 0:
+                self.destroyed.append(unit)
+        self._mobile = alive
+
+    def _breach(self, unit):
+        self.breaches.append(([unit.x, unit.y], unit.breach_damage, unit.unit_type, unit.player_index))
+        self.health[1 - unit.player_index] -= unit.breach_damage
+        self.sp_gained[unit.player_index] += unit.breach_sp
+        self._take_off_board(unit)
+
+    def _self_destruct(self, unit):
+        damage_f = damage_i = 0
+        if unit.steps >= unit.self_destruct_steps:
+            damage_f, damage_i = unit.self_destruct_damage_f, unit.self_destruct_damage_i
+            for target in list(self._structures.values()) + self._mobile:
+                if target.player_index != unit.player_index and target.health > 0 and self._in_range(unit, target, unit.self_destruct_range):
+                    target.health -= damage_f if target.stationary else damage_i
+        self.self_destructs.append(([unit.x, unit.y], damage_f, damage_i, unit.unit_type, unit.player_index))
+        self._take_off_board(unit)
+
+    def _take_off_board(self, unit):
+        # Breaching and self destructing units leave without counting as destroyed
+        unit.health = 0
+        unit.frames_to_move = -1
+
+    def _finder(self, target_edge):
+        finder = self._finders.get(target_edge)
+        if finder is None:
+            finder = self.game_state._path_finder(target_edge)
+            finder.prepare(self.game_state, self.game_map.get_edge_locations(target_edge))
+            for unit in self.destroyed:
+                if unit.stationary:
+                    self._open(finder, (unit.x, unit.y))
+            self._finders[target_edge] = finder
+        return finder
+
+    def _open(self, finder, location):
+        finder.set_blocked(location, False)
+        self._opened.append((finder, location))
+
+    def _in_range(self, source, target, radius):
+        return math.sqrt((source.x - target.x)**2 + (source.y - target.y)**2) < radius + self._hit_radius
+
+    def _get_target(self, attacker):
+        """Picks a target with the priority used by GameState.get_target
+
+        Mobile units > Nearest unit > Lowest health > Lowest Y position (relative to the attacker) > Closest to an edge
+        """
+        best = None
+        best_key = None
+        center = self._size / 2 - 0.5
+        if attacker.damage_i > 0:
+            for unit in self._mobile:
+                if unit.player_index != attacker.player_index and unit.health > 0 and self._in_range(attacker, unit, attacker.attackRange):
+                    key = self._target_key(attacker, unit, center)
+                    if best_key is None or key < best_key:
+                        best, best_key = unit, key
+        if best is None and attacker.damage_f > 0:
+            for location in self.game_map._locations_in_range([attacker.x, attacker.y], attacker.attackRange):
+                unit = self._structures.get(location)
+                if unit is not None and unit.player_index != attacker.player_index and unit.health > 0:
+                    key = self._target_key(attacker, unit, center)
+                    if best_key is None or key < best_key:
+                        best, best_key = unit, key
+        return best
+
+    @staticmethod
+    def _target_key(attacker, unit, center):
+        distance = math.sqrt((attacker.x - unit.x)**2 + (attacker.y - unit.y)**2)
+        height = unit.y if attacker.player_index == 0 else -unit.y
+        return (distance, unit.health, height, -abs(center - unit.x))
+
+    def warn(self, message, *args):
+        """ Used internally by the simulator to print warnings, counted with the game state's
+        """
+        self.game_state.warn(message, *args)
+
+
+class BatchSimulator:
+    """Simulates many deploy plans of yours against the same board in one pass
+
+    Each plan is a list of (unit_type, location, num) deploys made by you at the start of an action phase, with
+    the structures of the game state's map. The rules and the order of events are the ones of ActionSimulator,
+    and each plan gets the same summary ActionSimulator.summary() would give it. Your pending deploy stack is
+    deployed ahead of every plan, unless include_deploy_stack is false.
+
+    With NumPy, every plan advances together: unit positions, health, move timers and paths live in
+    plan x unit arrays and structure health in a plan x structure array, so each frame costs a handful of
+    whole array operations per attacking unit slot instead of a full Python simulation per plan.
+    Without NumPy, each plan is simulated with ActionSimulator.
+
+    Attributes :
+        * plans (list): The deploy plans being compared
+        * use_numpy (bool): Whether the NumPy batch is in use
+        * include_deploy_stack (bool): Whether your pending deploy stack is deployed ahead of every plan
+
+    """
+    MAX_FRAMES = ActionSimulator.MAX_FRAMES
+
+    def __init__(self, game_state, plans, use_numpy=True, include_deploy_stack=True):
+        """Sets up the batch
+
+        Args:
+            game_state: The GameState whose board every plan is played against
+            plans: A list of plans, each a list of (unit_type, location, num) deploys
+            use_numpy: If false, or if NumPy is not installed, the plans are simulated one at a time
+            include_deploy_stack: If false, the mobile units waiting in the deploy stack are left out
+
+        """
+        self.game_state = game_state
+        self.plans = [[(unit_type, [int(location[0]), int(location[1])], int(num)) for unit_type, location, num in plan] for plan in plans]
+        self.use_numpy = use_numpy and np is not None
+        self.include_deploy_stack = include_deploy_stack
+
+    def run(self, max_frames=None):
+        """Simulates every plan until none of its mobile units are left
+
+        Args:
+            max_frames: The most frames to simulate. Defaults to MAX_FRAMES.
+
+        Returns:
+            A list with the summary of each plan, in order. See ActionSimulator.summary.
+
+        """
+        limit = self.MAX_FRAMES if max_frames is None else max_frames
+        if not self.use_numpy:
+            summaries = []
+            for plan in self.plans:
+                simulation = ActionSimulator(self.game_state, self.include_deploy_stack)
+                for unit_type, location, num in plan:
+                    for _ in range(num):
+                        simulation.add_unit(unit_type, location, 0)
+                summaries.append(simulation.run(limit).summary())
+            return summaries
+
+        self._setup()
+        try:
+            while self._on_board.any() and self.frame < limit:
+                self.frame += 1
+                self._frames[self._on_board.any(axis=1)] = self.frame
+                self._shield()
+                self._move()
+                self._attack()
+                self._remove_dead()
+        finally:
+            self._close()
+        return self._summaries()
+
+    def _setup(self):
+        game_state = self.game_state
+        game_map = game_state.game_map
+        config = game_state.config
+        size = game_state.ARENA_SIZE
+        self._size = size
+        self._center = size / 2 - 0.5
+        hit_radius = config["unitInformation"][0].get("getHitRadius", 0)
+        type_configs = {info.get("shorthand"): info for info in config["unitInformation"]}
+        tiles = size * size
+        tile_x = np.arange(tiles) // size
+        tile_y = np.arange(tiles) % size
+
+        structures = []
+        for x, y in game_map.mask_locations(game_map.get_structure_mask()):
+            for unit in game_map[x, y]:
+                if unit.stationary:
+                    structures.append(SimulatedUnit(unit, type_configs[unit.unit_type], size))
+        self._structures = structures
+        count = len(structures)
+        plans = len(self.plans)
+        self._sx = np.array([unit.x for unit in structures], dtype=np.int64)
+        self._sy = np.array([unit.y for unit in structures], dtype=np.int64)
+        self._start_health = np.array([unit.health for unit in structures], dtype=float)
+        self._s_health = np.tile(self._start_health, (plans, 1))
+        self._s_alive = np.ones((plans, count), dtype=bool)
+        self._s_enemy = np.array([unit.player_index == 1 for unit in structures], dtype=bool)
+        self._destroyed = [[] for _ in range(plans)]
+
+        # distances between every tile and every structure, and which pairs are in range for each radius
+        dx = tile_x[:, None] - self._sx[None, :]
+        dy = tile_y[:, None] - self._sy[None, :]
+        self._d2 = (dx * dx + dy * dy).astype(float)
+        distance = np.sqrt(self._d2)
+        self._ranges = {}
+        def in_range(radius):
+            table = self._ranges.get(radius)
+            if table is None:
+                table = distance < radius + hit_radius
+                self._ranges[radius] = table
+            return table
+        self._in_range = in_range
+
+        pending = [(unit_type, [x, y], 1) for unit_type, x, y in game_state._deploy_stack] if self.include_deploy_stack else []
+        units = [[] for _ in range(plans)]
+        for index, plan in enumerate(self.plans):
+            for unit_type, location, num in pending + plan:
+                for _ in range(num):
+                    units[index].append(SimulatedUnit(GameUnit(unit_type, config, 0, None, location[0], location[1]), type_configs[unit_type], size))
+        slots = max([len(plan_units) for plan_units in units] + [0])
+        self._slots = slots
+        shape = (plans, slots)
+        self._on_board = np.zeros(shape, dtype=bool)
+        self._health = np.zeros(shape)
+        self._x = np.zeros(shape, dtype=np.int64)
+        self._y = np.zeros(shape, dtype=np.int64)
+        self._edge = np.zeros(shape, dtype=np.int64)
+        self._timer = np.zeros(shape, dtype=np.int64)
+        self._frames_per_move = np.zeros(shape, dtype=np.int64)
+        self._steps = np.zeros(shape, dtype=np.int64)
+        self._path_id = np.full(shape, -1, dtype=np.int64)
+        self._path_pos = np.zeros(shape, dtype=np.int64)
+        self._damage_f = np.zeros(shape)
+        self._range = np.zeros(shape)
+        self._units = units
+        for index, plan_units in enumerate(units):
+            for slot, unit in enumerate(plan_units):
+                unit.target_edge = game_state.get_target_edge([unit.x, unit.y])
+                self._on_board[index, slot] = True
+                self._health[index, slot] = unit.health
+                self._x[index, slot] = unit.x
+                self._y[index, slot] = unit.y
+                self._edge[index, slot] = unit.target_edge
+                self._timer[index, slot] = unit.frames_to_move
+                self._frames_per_move[index, slot] = unit.frames_to_move
+                self._damage_f[index, slot] = unit.damage_f
+                self._range[index, slot] = unit.attackRange
+
+        self._on_edge = np.zeros((4, tiles), dtype=bool)
+        for edge, locations in enumerate(game_map.get_edges()):
+            for x, y in locations:
+                self._on_edge[edge, x * size + y] = True
+
+        self._paths = []
+        self._path_ids = {}
+        self._path_x = np.zeros((0, 1), dtype=np.int64)
+        self._path_y = np.zeros((0, 1), dtype=np.int64)
+        self._path_len = np.zeros(0, dtype=np.int64)
+        self._finders = {}
+
+        self.frame = 0
+        self._breaches = np.zeros(plans, dtype=np.int64)
+        self._player_damage = np.zeros(plans)
+        self._sp_gained = np.zeros(plans)
+        self._killed = np.zeros(plans, dtype=np.int64)
+        self._frames = np.zeros(plans, dtype=np.int64)
+        self._shielded = np.zeros((plans, slots, count), dtype=bool)
+
+    def _shield(self):
+        for index, support in enumerate(self._structures):
+            if support.player_index != 0 or support.shieldRange <= 0 or support.shield <= 0:
+                continue
+            tile = self._x * self._size + self._y
+            receives = self._on_board & (self._health > 0) & self._s_alive[:, index:index + 1] & ~self._shielded[:, :, index] \
+                & self._in_range(support.shieldRange)[tile, index]
+            self._health[receives] += support.shield
+            self._shielded[:, :, index] |= receives
+
+    def _move(self):
+        timer = self._timer
+        active = self._on_board & (self._health > 0) & (self._frames_per_move > 0)
+        timer[active] -= 1
+        movers = active & (timer == 0)
+        if not movers.any():
+            return
+        timer[movers] = self._frames_per_move[movers]
+
+        for index, slot in zip(*np.nonzero(movers & (self._path_id < 0))):
+            self._path_id[index, slot] = self._path_for(index, slot)
+            self._path_pos[index, slot] = 0
+
+        at_end = np.zeros_like(movers)
+        at_end[movers] = self._path_pos[movers] + 1 >= self._path_len[self._path_id[movers]]
+        for index, slot in zip(*np.nonzero(at_end)):
+            self._self_destruct(index, slot)
+
+        stepping = movers & ~at_end
+        self._path_pos[stepping] += 1
+        path_id, path_pos = self._path_id[stepping], self._path_pos[stepping]
+        self._x[stepping] = self._path_x[path_id, path_pos]
+        self._y[stepping] = self._path_y[path_id, path_pos]
+        self._steps[stepping] += 1
+
+        breaching = np.zeros_like(stepping)
+        breaching[stepping] = self._on_edge[self._edge[stepping], self._x[stepping] * self._size + self._y[stepping]]
+        for index, slot in zip(*np.nonzero(breaching)):
+            unit = self._units[index][slot]
+            self._breaches[index] += 1
+            self._player_damage[index] += unit.breach_damage
+            self._sp_gained[index] += unit.breach_sp
+        self._on_board[breaching] = False
+
+    def _self_destruct(self, index, slot):
+        unit = self._units[index][slot]
+        if self._steps[index, slot] >= unit.self_destruct_steps:
+            tile = self._x[index, slot] * self._size + self._y[index, slot]
+            hit = self._in_range(unit.self_destruct_range)[tile] & self._s_enemy & (self._s_health[index] > 0)
+            self._s_health[index, hit] -= unit.self_destruct_damage_f
+        self._on_board[index, slot] = False
+
+    def _attack(self):
+        size = self._size
+        tile = self._x * size + self._y
+        height = -self._y
+        edge_distance = -np.abs(self._center - self._x)
+        for index, turret in enumerate(self._structures):
+            if turret.player_index != 1 or turret.damage_i <= 0:
+                continue
+            candidates = self._on_board & (self._health > 0) & self._s_alive[:, index:index + 1] & (self._s_health[:, index:index + 1] > 0) \
+                & self._in_range(turret.attackRange)[tile, index]
+            rows = np.nonzero(candidates.any(axis=1))[0]
+            if not len(rows):
+                continue
+            picked, target = self._pick(candidates[rows], (self._d2[tile[rows], index], self._health[rows], height[rows], edge_distance[rows]))
+            self._health[rows[picked], target] -= turret.damage_i
+
+        structure_height = self._sy[None, :]
+        structure_edge_distance = -np.abs(self._center - self._sx)[None, :]
+        for slot in range(self._slots):
+            attackers = self._on_board[:, slot] & (self._health[:, slot] > 0) & (self._damage_f[:, slot] > 0)
+            if not attackers.any():
+                continue
+            rows = np.nonzero(attackers)[0]
+            attacker_tile = tile[rows, slot]
+            in_range = np.zeros((len(rows), len(self._structures)), dtype=bool)
+            for radius in np.unique(self._range[rows, slot]):
+                same = self._range[rows, slot] == radius
+                in_range[same] = self._in_range(radius)[attacker_tile[same]]
+            candidates = in_range & self._s_enemy[None, :] & self._s_alive[rows] & (self._s_health[rows] > 0)
+            if not candidates.any():
+                continue
+            picked, target = self._pick(candidates, (self._d2[attacker_tile], self._s_health[rows], structure_height, structure_edge_distance))
+            self._s_health[rows[picked], target] -= self._damage_f[rows[picked], slot]
+
+    @staticmethod
+    def _pick(candidates, keys):
+        """Finds the first candidate of each row with the lexicographically smallest keys
+
+        Returns:
+            The rows that have a candidate and the column picked in each of them
+        """
+        best = candidates
+        for key in keys:
+            values = np.where(best, key, np.inf)
+            best = best & (values == values.min(axis=1, keepdims=True))
+        rows = np.nonzero(candidates.any(axis=1))[0]
+        return rows, best[rows].argmax(axis=1)
+
+    def _remove_dead(self):
+        died = self._s_alive & (self._s_health <= 0)
+        if died.any():
+            self._s_alive &= ~died
+            for index, column in zip(*np.nonzero(died)):
+                structure = self._structures[column]
+                self._destroyed[index].append((structure.x, structure.y))
+                self._path_id[index] = -1
+        killed = self._on_board & (self._health <= 0)
+        if killed.any():
+            self._killed += killed.sum(axis=1)
+            self._on_board &= ~killed
+
+    def _path_for(self, index, slot):
+        x, y = int(self._x[index, slot]), int(self._y[index, slot])
+        edge = int(self._edge[index, slot])
+        opened = tuple(self._destroyed[index])
+        key = (frozenset(opened), x, y, edge)
+        path_id = self._path_ids.get(key)
+        if path_id is not None:
+            return path_id
+
+        finder = self._finders.get(edge)
+        if finder is None:
+            finder = self.game_state._path_finder(edge)
+            finder.prepare(self.game_state, self.game_state.game_map.get_edge_locations(edge))
+            self._finders[edge] = finder
+        for location in opened:
+            finder.set_blocked(location, False)
+        path = finder.navigate([x, y]) or [[x, y]]
+        for location in reversed(opened):
+            finder.set_blocked(location, True)
+
+        path_id = len(self._paths)
+        self._paths.append(path)
+        self._path_ids[key] = path_id
+        width = max(self._path_x.shape[1], len(path))
+        path_x = np.zeros((path_id + 1, width), dtype=np.int64)
+        path_y = np.zeros((path_id + 1, width), dtype=np.int64)
+        path_x[:path_id, :self._path_x.shape[1]] = self._path_x
+        path_y[:path_id, :self._path_y.shape[1]] = self._path_y
+        path_x[path_id, :len(path)] = [location[0] for location in path]
+        path_y[path_id, :len(path)] = [location[1] for location in path]
+        self._path_x, self._path_y = path_x, path_y
+        self._path_len = np.append(self._path_len, len(path))
+        return path_id
+
+    def _close(self):
+        # _path_for restores every tile it opens, so the shared pathfinders are left as they were found
+        self._finders = {}
+
+    def _summaries(self):
+        damage = np.where(self._s_enemy[None, :], self._start_health[None, :] - np.maximum(self._s_health, 0), 0).sum(axis=1)
+        destroyed = (~self._s_alive & self._s_enemy[None, :]).sum(axis=1)
+        summaries = []
+        for index, plan_units in enumerate(self._units):
+            summaries.append({
+                "breaches": int(self._breaches[index]),
+                "player_damage": float(self._player_damage[index]),
+                "sp_gained": float(self._sp_gained[index]),
+                "structure_damage": float(damage[index]),
+                "structures_destroyed": int(destroyed[index]),
+                "survivors": len(plan_units) - int(self._killed[index]),
+                "frames": int(self._frames[index])
+            })
+        return summaries
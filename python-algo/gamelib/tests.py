@@ -1,7 +1,23 @@
 import unittest
 import json
+import io
+import sys
+import pickle
+import copy
+import time
+import threading
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, compile_unit_specs
+from . import navigation
+from .navigation import ShortestPathFinder, DynamicShortestPathFinder
+from .simulator import ActionSimulator, BatchSimulator
+from .search import PlanSearch
+from . import search as search_module
+from . import util
+from .util import EngineMessage, parse_message, DebugLog
+from .algocore import AlgoCore, BackgroundTask
+from .board import BoardTracker, BoardDelta
+from . import unit_table
 
 class BasicTests(unittest.TestCase):
 
@@ -235,6 +251,18 @@ class BasicTests(unittest.TestCase):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
         
+    def test_out_of_bounds_units(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 13], 1)
+        mask = game.game_map.get_structure_mask()
+        for location in [[-1, 5], [28, 13], [0, 0]]:
+            game.game_map.add_unit("FF", location, 0)
+            game.game_map.add_unit("PI", location, 0)
+            game.game_map.remove_unit(location)
+        self.assertEqual(mask, game.game_map.get_structure_mask(), "Out of bounds units changed the structure mask")
+        self.assertEqual([0, mask], [game.game_map.get_structure_mask(0), game.game_map.get_structure_mask(1)])
+        self.assertEqual([[13, 13]], [location for location in game.game_map if game.game_map[location]])
+
     def test_get_units_in_range(self):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
@@ -275,3 +303,739 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+
+    def test_pathfinder_reuse(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], path[0], "Path should begin at the start location")
+        self.assertIn(path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Path should end on the target edge")
+        for a, b in zip(path, path[1:]):
+            self.assertEqual(1, abs(a[0] - b[0]) + abs(a[1] - b[1]), "Path steps should be adjacent tiles")
+
+        for x in range(10, 18):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        walled_path = game.find_path_to_edge([13, 0])
+        fresh_path = ShortestPathFinder().navigate_multiple_endpoints([13, 0], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), game)
+        self.assertEqual(fresh_path, walled_path, "A reused pathfinder should match a fresh one")
+        for location in walled_path:
+            self.assertFalse(game.contains_stationary_unit(location), "Path goes through a wall")
+
+        for x in range(10, 18):
+            game.game_map.remove_unit([x, 13])
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Stale walls leaked into a later search")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual((0, 1), (game.path_cache_hits, game.path_cache_misses), "First search should miss the cache")
+        path[0][0] = -1
+        self.assertEqual([13, 0], game.find_path_to_edge([13, 0])[0], "Cached path was modified through a returned copy")
+        self.assertEqual((1, 1), (game.path_cache_hits, game.path_cache_misses), "Repeated search should hit the cache")
+
+        game.attempt_spawn("FF", [[13, 1]])
+        blocked_path = game.find_path_to_edge([13, 0])
+        self.assertNotIn([13, 1], blocked_path, "Spawning a structure did not invalidate the cached path")
+        self.assertEqual(2, game.path_cache_misses, "Changing the structures should force a new search")
+
+        game.game_map.remove_unit([13, 1])
+        self.assertEqual(0, game.game_map.get_obstruction_signature(), "Removing the only structure should clear the signature")
+        self.assertEqual(path[1:], game.find_path_to_edge([13, 0])[1:], "Path should come back once the structure is gone")
+        self.assertEqual(2, game.path_cache_hits, "Returning to a known board should hit the cache")
+
+    def test_find_paths_from_edges(self):
+        game = self.make_turn_0_map()
+        for x in range(6, 22):
+            game.game_map.add_unit("FF", [x, 10], 0)
+        for location in [[3, 10], [4, 11], [5, 12], [23, 12], [24, 11]]:
+            game.game_map.add_unit("DF", location, 1)
+        game.game_map.add_unit("FF", [13, 0], 0)
+
+        for player_index in [0, 1]:
+            paths = game.find_paths_from_edges(player_index)
+            self.assertEqual(28, len(paths), "Every edge location should have an entry")
+            for start, path in paths.items():
+                single = ShortestPathFinder().navigate_multiple_endpoints(list(start), game.game_map.get_edge_locations(game.get_target_edge(start)), game)
+                self.assertEqual(single, path, "Batched path from {} differs from a single search".format(start))
+        self.assertIsNone(game.find_paths_from_edges(0)[(13, 0)], "Blocked spawn locations should have no path")
+
+    def test_dynamic_pathfinder(self):
+        game = self.make_turn_0_map()
+        finder = DynamicShortestPathFinder(verify=True)
+        finder.reset(game, game.game_map.get_edge_locations(game.game_map.TOP_RIGHT))
+        starts = [[13, 0], [5, 8], [20, 6], [13, 13]]
+
+        # Seal the bottom half off row by row, checking every intermediate board against a from scratch search
+        walls = [[x, 12] for x in range(1, 27)] + [[0, 13], [27, 13]]
+        for location in walls:
+            game.game_map.add_unit("FF", location, 0)
+            finder.sync(game)
+            for start in starts:
+                finder.navigate(start)
+        self.assertNotIn(finder.navigate([13, 0])[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Sealed in units should self destruct")
+
+        for location in reversed(walls):
+            finder.set_blocked(location, False)
+            for start in starts:
+                finder.navigate(start)
+        self.assertIn(finder.navigate([13, 0])[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Reopened board should reach the edge")
+
+    @unittest.skipIf(navigation.np is None, "NumPy is not installed")
+    def test_numpy_pathfinder(self):
+        game = self.make_turn_0_map()
+        for location in [[x, 12] for x in range(3, 25)] + [[13, 5], [14, 5], [12, 6], [4, 8]]:
+            game.game_map.add_unit("FF", location, 0)
+        for location in [[x, 16] for x in range(0, 26)]:
+            game.game_map.add_unit("FF", location, 1)
+        for end_points in game.game_map.get_edges():
+            for start in [[13, 0], [14, 1], [5, 8], [13, 13], [20, 20], [1, 14]]:
+                expected = ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+                actual = ShortestPathFinder(use_numpy=True).navigate_multiple_endpoints(start, end_points, game)
+                self.assertEqual(expected, actual, "NumPy path from {} differs".format(start))
+
+    @unittest.skipIf(navigation.np is None, "NumPy is not installed")
+    def test_numpy_pathfinder_multiple_starts(self):
+        game = self.make_turn_0_map()
+        # seal the two starts in the left corner into their own pocket, so the starts span two pockets
+        for location in [[0, 14], [1, 14], [2, 13], [2, 12]]:
+            game.game_map.add_unit("FF", location, 0)
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+
+        finder = ShortestPathFinder(use_numpy=True)
+        calls = []
+        validate = finder._validate
+        finder._validate = lambda *args: calls.append(args) or validate(*args)
+        paths = finder.navigate_multiple_starts(starts, end_points, game)
+        self.assertEqual(2, len(calls), "Validation should run once per pocket")
+        for start in starts:
+            expected = ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+            self.assertEqual(expected, paths[tuple(start)], "NumPy path from {} differs".format(start))
+
+    def test_evaluate_placements(self):
+        game = self.make_turn_0_map()
+        for x in range(4, 24):
+            game.game_map.add_unit("FF", [x, 11], 0)
+        starts = [[13, 0], [14, 0], [5, 8], [22, 8]]
+        candidates = [[3, 11], [24, 11], [13, 5], [14, 1], [13, 0], [10, 20], [4, 11]]
+        signature = game.game_map.get_obstruction_signature()
+        results = game.evaluate_placements(candidates, starts)
+        self.assertEqual(signature, game.game_map.get_obstruction_signature(), "Evaluating placements changed the map")
+
+        for candidate in candidates:
+            game.game_map.add_unit("FF", candidate, 0)
+            for start in starts:
+                expected = None if candidate == start else ShortestPathFinder().navigate_multiple_endpoints(start, game.game_map.get_edge_locations(game.get_target_edge(start)), game)
+                self.assertEqual(expected, results[tuple(candidate)][tuple(start)], "Wrong path from {} with a structure at {}".format(start, candidate))
+            if candidate != [4, 11]:
+                game.game_map.remove_unit(candidate)
+
+    def test_bitboards(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        self.assertEqual(420, game_map.count_mask(game_map.get_in_bounds_mask()))
+        self.assertEqual(game_map.get_in_bounds_mask(), game_map.get_half_mask(0) | game_map.get_half_mask(1))
+        for edge in range(4):
+            self.assertEqual(sorted(game_map.get_edge_locations(edge)), game_map.mask_locations(game_map.get_edge_mask(edge)))
+
+        game_map.add_unit("FF", [13, 14], 1)
+        game_map.add_unit("DF", [14, 15], 1)
+        game_map.add_unit("FF", [14, 13], 0)
+        game_map.add_unit("PI", [13, 13], 0)
+        self.assertEqual([[13, 14], [14, 15]], game_map.mask_locations(game_map.get_structure_mask(1) & game_map.get_rows_mask(14, 15)))
+        self.assertEqual([[14, 13]], game_map.mask_locations(game_map.get_structure_mask(0)))
+
+        game_map.add_unit("FF", [13, 14], 0)
+        self.assertEqual(2, game_map.count_mask(game_map.get_structure_mask(0)))
+        game_map.remove_unit([14, 15])
+        game_map[14, 13] = []
+        self.assertEqual([[13, 14]], game_map.mask_locations(game_map.get_structure_mask()))
+        self.assertEqual(0, game_map.get_structure_mask(1))
+        self.assertFalse(game.contains_stationary_unit([14, 13]))
+        self.assertTrue(game_map.in_arena_bounds([13.5, 0]))
+        self.assertFalse(game_map.in_arena_bounds([0, 0]))
+
+    def test_range_tables(self):
+        game = self.make_turn_0_map()
+        in_range = game.game_map._locations_in_range([13, 1], 2.5)
+        self.assertIs(in_range, game.game_map._locations_in_range([13, 1], 2.5), "Range results should be shared")
+        self.assertIn((13, 0), in_range)
+        self.assertNotIn((11, 0), in_range, "Tiles outside the arena should be clipped")
+        self.assertEqual(sorted(in_range), list(in_range))
+        self.assertEqual(in_range, game.game_map._locations_in_range([13.0, 1.0], 2.5))
+
+        # the public method still returns new [x, y] lists
+        locations = game.game_map.get_locations_in_range([13, 1], 2.5)
+        self.assertEqual([list(location) for location in in_range], locations)
+        self.assertIn([13, 0], locations)
+        locations.append([0, 0])
+        self.assertNotIn([0, 0], game.game_map.get_locations_in_range([13, 1], 2.5))
+
+    def test_threat_map(self):
+        def expected_threat(game, player_index):
+            return [[sum(unit.damage_i for unit in game.get_attackers([x, y], player_index)) if game.game_map.in_arena_bounds([x, y]) else 0
+                     for y in range(game.ARENA_SIZE)] for x in range(game.ARENA_SIZE)]
+
+        game = self.make_turn_0_map()
+        game.enable_warnings = False
+        game._player_resources[0]['SP'] = 100
+        game.game_map.add_unit("DF", [12, 16], 1)
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("FF", [14, 16], 1)
+        self.assertEqual(expected_threat(game, 0), game.threat_map(0))
+        self.assertEqual(10, game.threat_map(0)[13][14])
+
+        game.attempt_spawn("DF", [[13, 10], [14, 10]])
+        game.attempt_upgrade([13, 10])
+        self.assertEqual(expected_threat(game, 1), game.threat_map(1))
+        self.assertEqual(20, game.threat_map(1)[13][12])
+
+        game.game_map.remove_unit([12, 16])
+        self.assertEqual(expected_threat(game, 0), game.threat_map(0))
+
+        # a wall swapped for a turret leaves the same tiles blocked
+        game.game_map.add_unit("FF", [14, 17], 1)
+        self.assertEqual(expected_threat(game, 0), game.threat_map(0))
+        game.game_map.add_unit("DF", [14, 17], 1)
+        self.assertEqual(expected_threat(game, 0), game.threat_map(0))
+        game.game_map[14, 17] = []
+        self.assertEqual(expected_threat(game, 0), game.threat_map(0))
+        self.assertIsNone(game.threat_map(2))
+        self.assertIsNone(game.estimate_path_damage([[13, 14]], "PI", 1, 2))
+
+    def test_estimate_path_damage(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [12, 16], 1)
+        path = [[13, y] for y in range(12, 20)]
+
+        scouts = game.estimate_path_damage(path, "PI", 2)
+        self.assertEqual([0, 0, 1, 1, 1, 1, 1, 0], scouts["frames_in_range"])
+        self.assertEqual(25, scouts["total_damage"])
+        self.assertEqual([2, 2, 2, 2, 1, 1, 1, 1], scouts["survivors"])
+
+        demolishers = game.estimate_path_damage(path, "EI", 3)
+        self.assertEqual([0, 0, 2, 2, 2, 2, 2, 0], demolishers["frames_in_range"])
+        self.assertEqual(15, demolishers["total_damage"])
+        self.assertEqual([3, 3, 1, 0, 0, 0, 0, 0], demolishers["survivors"])
+
+        # an upgraded turret shot deals 15, three times a demolisher's health, but still kills only one of them
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [12, 16], 1)
+        game.contains_stationary_unit([12, 16]).upgrade()
+        demolishers = game.estimate_path_damage(path, "EI", 3)
+        self.assertEqual([3, 1, 0, 0, 0, 0, 0, 0], demolishers["survivors"])
+        self.assertEqual([0, 10, 5, 0, 0, 0, 0, 0], demolishers["damage"])
+
+        # the shots attempt_spawn and attempt_upgrade keep in the threat maps match a rebuild
+        game = self.make_turn_0_map()
+        game._player_resources[0]['SP'] = 100
+        enemy_path = [[13, y] for y in range(17, 7, -1)]
+        game.estimate_path_damage(enemy_path, "EI", 3, 1)
+        game.attempt_spawn("DF", [[13, 10], [14, 11]])
+        game.attempt_upgrade([13, 10])
+        kept = game.estimate_path_damage(enemy_path, "EI", 3, 1)
+        game._threat_maps = None
+        self.assertEqual(game.estimate_path_damage(enemy_path, "EI", 3, 1), kept)
+        self.assertEqual([3, 3, 3, 3, 0, 0, 0, 0, 0, 0], kept["survivors"])
+
+    def test_action_simulator(self):
+        game = self.make_turn_0_map()
+        game.enable_warnings = False
+        game._player_resources[0]['MP'] = 20
+        for x in range(28):
+            if x != 13 and game.game_map.in_arena_bounds([x, 14]):
+                game.game_map.add_unit("FF", [x, 14], 1)
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.attempt_spawn("PI", [13, 0], 5)
+        signature = game.game_map.get_obstruction_signature()
+
+        simulation = ActionSimulator(game).run()
+        self.assertEqual(2, len([unit for unit in simulation.destroyed if unit.unit_type == "PI"]))
+        self.assertEqual(3, len(simulation.breaches))
+        self.assertEqual([30, 27], simulation.health)
+        self.assertEqual([3, 0], simulation.sp_gained)
+        self.assertEqual(90, game.game_map[13, 16][0].health, "Simulating changed the game state")
+        self.assertEqual(signature, game._path_finder(game.game_map.TOP_RIGHT)._signature)
+
+        game = self.make_turn_0_map()
+        game._player_resources[0]['MP'] = 20
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 8]):
+                game.game_map.add_unit("FF", [x, 8], 1)
+        game.attempt_spawn("EI", [13, 0], 3)
+        simulation = ActionSimulator(game).run()
+        self.assertEqual(3, len(simulation.self_destructs))
+        self.assertEqual(([21, 7], 5, 5, "EI", 0), simulation.self_destructs[0])
+        self.assertEqual([], simulation.destroyed)
+        wall_health = {(unit.x, unit.y): unit.health for unit in simulation.units}
+        self.assertEqual([39, 3, 3, 3, 39 - 3 * 5, 39 - 3 * 5], [wall_health[(x, 8)] for x in range(16, 22)])
+
+    def test_batch_simulator(self):
+        game = self.make_turn_0_map()
+        game.enable_warnings = False
+        for x in range(28):
+            if x not in (12, 20) and game.game_map.in_arena_bounds([x, 15]):
+                game.game_map.add_unit("FF", [x, 15], 1)
+        game.game_map.add_unit("DF", [12, 17], 1)
+        game.game_map.add_unit("DF", [19, 17], 1)
+        game.game_map.add_unit("DF", [11, 10], 0)
+        plans = [[("PI", [13, 0], 5)], [("EI", [13, 0], 3), ("PI", [14, 0], 4)], [("SI", [3, 10], 2)], [("PI", [20, 6], 10)], []]
+
+        serial = BatchSimulator(game, plans, use_numpy=False).run()
+        self.assertEqual(len(plans), len(serial))
+        self.assertEqual(0, serial[-1]["survivors"])
+        if navigation.np is not None:
+            self.assertEqual(serial, BatchSimulator(game, plans).run())
+
+        # units already waiting in the deploy stack go ahead of every plan, as in ActionSimulator
+        game.attempt_spawn("PI", [13, 0], 3)
+        queued = ActionSimulator(game)
+        for _ in range(5):
+            queued.add_unit("PI", [13, 0], 0)
+        self.assertEqual(queued.run().summary(), BatchSimulator(game, plans[:1], use_numpy=False).run()[0])
+        self.assertEqual(serial, BatchSimulator(game, plans, use_numpy=False, include_deploy_stack=False).run())
+        if navigation.np is not None:
+            self.assertEqual(BatchSimulator(game, plans, use_numpy=False).run(), BatchSimulator(game, plans).run())
+
+    def test_plan_search(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Stats"][2] = 10.0
+        state["p2Units"][0] = [[x, 15, 75.0, str(x)] for x in range(28) if x not in (12, 20) and game.game_map.in_arena_bounds([x, 15])]
+        state["p2Units"][2] = [[19, 17, 100.0, "19"]]
+        game = GameState(game.config, json.dumps(state))
+        game.suppress_warnings(True)
+        game.attempt_spawn("FF", [12, 13])
+        search = PlanSearch(game.config, processes=0)
+        self.assertEqual(2.5, search.time_budget)
+
+        plans = search.candidate_plans(game, builds=[[], [("DF", [11, 10])]], locations=[[13, 0], [3, 10]])
+        self.assertEqual(2 * (1 + 2 * 2 + 2 * 2), len(plans))
+        self.assertEqual((None, None), search.search(game, plans, deadline=0))
+        plan, summary = search.search(game, plans, deadline=float("inf"))
+        self.assertEqual(len(plans), search.evaluated)
+        self.assertEqual(("PI", [3, 10], 10), plan.deploy[0])
+
+        search.apply_plan(game, plan)
+        self.assertEqual(0, game.get_resource(game.MP))
+        self.assertEqual(summary, ActionSimulator(game).run().summary())
+
+    def test_plan_search_pool(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Stats"][2] = 10.0
+        game = GameState(game.config, json.dumps(state))
+        game.suppress_warnings(True)
+        search = PlanSearch(game.config, processes=2)
+        if search._pool is None:
+            self.skipTest("Forking is not available")
+        try:
+            plans = search.candidate_plans(game, builds=[[], [("DF", [11, 10])], [("FF", [12, 10])]], locations=[[13, 0], [3, 10], [24, 10]])
+            search.search(game, plans, deadline=time.perf_counter() + 0.01)
+            self.assertEqual(1, search._generation.value)
+
+            # tasks the first search left queued are skipped instead of delaying the second one
+            stale = (game.serialized_string, search_module._snapshot(game), (), [plans[0].deploy], 0)
+            self.assertIsNone(search._pool.apply(search_module._evaluate, (stale,)))
+            plan, summary = search.search(game, plans, deadline=float("inf"))
+            self.assertEqual(len(plans), search.evaluated)
+            self.assertEqual(2, search._generation.value)
+            self.assertGreater(search.batch_seconds, 0)
+            self.assertEqual((plan, summary), PlanSearch(game.config).search(game, plans, deadline=float("inf")))
+
+            # workers see structures changed through the game_map, not only the ones on the stacks
+            game.attempt_spawn("FF", [13, 3])
+            for x in range(28):
+                if game.game_map.in_arena_bounds([x, 15]) and x != 13:
+                    game.game_map.add_unit("FF", [x, 15], 1)
+            game.game_map.add_unit("DF", [13, 17], 1)
+            game.game_map[13, 17][0].upgrade()
+            game.game_map[13, 17][0].health = 30
+            self.assertEqual(PlanSearch(game.config).search(game, plans, deadline=float("inf")),
+                             search.search(game, plans, deadline=float("inf")))
+        finally:
+            search.close()
+
+    def test_parsed_state(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Units"][2] = [[13, 10, 75.0, "1"]]
+        message = EngineMessage(json.dumps(state), state)
+        self.assertIs(state, parse_message(message))
+        self.assertEqual(state, parse_message(str(message)))
+
+        from_dict = GameState(game.config, state)
+        from_message = GameState(game.config, message)
+        self.assertEqual("DF", from_dict.game_map[13, 10][0].unit_type)
+        self.assertEqual("DF", from_message.game_map[13, 10][0].unit_type)
+        self.assertIs(message, from_message.serialized_string)
+        self.assertEqual(state, json.loads(from_dict.serialized_string))
+
+    def test_action_frame_filter(self):
+        frame = json.loads(self.make_turn_0_map().serialized_string)
+        frame["turnInfo"] = [1, 3, 7]
+        frame["p1Units"][0] = [[x, 13, 60.0, str(x)] for x in range(28)]
+        quiet = json.dumps(frame, separators=(",", ":"))
+        frame["events"]["breach"] = [[[13, 0], 1, 3, "5", 2]]
+        breach = json.dumps(frame)
+
+        core = AlgoCore()
+        self.assertEqual(frame, core._action_frame_message(breach, [1, 3, 7]).state)
+        core.ACTION_FRAME_EVENTS = ("breach",)
+        core.ACTION_FRAME_FIELDS = ("events",)
+        self.assertIsNone(core._action_frame_message(quiet, [1, 3, 7]))
+        self.assertIsNone(core._action_frame_message(json.dumps(json.loads(quiet)), [1, 3, 7]))
+        self.assertEqual(2, core.skipped_frames)
+        message = core._action_frame_message(breach, [1, 3, 7])
+        self.assertEqual({"turnInfo": [1, 3, 7], "events": frame["events"]}, message.state)
+        self.assertEqual(breach, message)
+
+    def test_background_task(self):
+        class Speculator(AlgoCore):
+            def precompute(self, task, game_state):
+                count = 0
+                while not task.checkpoint():
+                    count += 1
+                return (game_state, count)
+
+        switch_interval = sys.getswitchinterval()
+        core = Speculator()
+        core._start_background("turn 1")
+        self.assertEqual(min(switch_interval, core.BACKGROUND_SWITCH_INTERVAL), sys.getswitchinterval())
+        start = time.perf_counter()
+        core._finish_background()
+        self.assertLess(time.perf_counter() - start, core.BACKGROUND_HANDOFF_TIMEOUT, "A precompute at a checkpoint should hand off at once")
+        self.assertEqual("turn 1", core.precomputed[0])
+        self.assertIsNone(core._background)
+        self.assertEqual(switch_interval, sys.getswitchinterval())
+        core._finish_background()
+        self.assertIsNone(core.precomputed)
+
+        self.assertEqual(4, BackgroundTask(lambda task, x: x * 2, 2).finish(1))
+        self.assertIsNone(BackgroundTask(lambda task: 1 / 0).finish(1))
+        core = AlgoCore()
+        core._start_background("turn 1")
+        self.assertIsNone(core._background, "A background thread was started without precompute")
+
+        class Overrunner(AlgoCore):
+            started = 0
+            release = threading.Event()
+            def precompute(self, task, game_state):
+                Overrunner.started += 1
+                Overrunner.release.wait(5)
+                return game_state
+
+        core = Overrunner()
+        core._start_background("turn 1")
+        stale = core._background
+        core._finish_background()
+        self.assertIsNone(core.precomputed)
+        self.assertIs(stale, core._background, "An unfinished task should be kept")
+        core._start_background("turn 2")
+        core._finish_background()
+        self.assertEqual(1, Overrunner.started, "A precompute was started while the last one was still running")
+        self.assertIs(stale, core._background)
+
+        Overrunner.release.set()
+        stale._thread.join(1)
+        core._finish_background()
+        self.assertIsNone(core.precomputed, "The result of an overrun should be dropped")
+        self.assertIsNone(core._background)
+        core._start_background("turn 4")
+        core._finish_background()
+        self.assertEqual(2, Overrunner.started)
+        self.assertEqual("turn 4", core.precomputed)
+
+    def test_board_tracker(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        board = BoardTracker(game.config, verify=True)
+        board.start_turn(state)
+
+        frame = json.loads(game.serialized_string)
+        frame["events"]["spawn"] = [[[13, 10], 0, "1", 1], [[13, 17], 2, "2", 2], [[13, 10], 6, "3", 1], [[13, 0], 3, "4", 1]]
+        board.apply_frame(json.dumps(frame))
+        frame["events"] = {"spawn": [], "damage": [[[13, 10], 10.0, 0, "1", 1], [[13, 1], 5.0, 3, "4", 1]], "death": [[[13, 17], 2, "2", 2, False]]}
+        board.apply_frame(json.dumps(frame))
+        board.apply_frame(json.dumps(frame), {"spawn": [], "damage": [], "death": []})
+
+        state["turnInfo"] = [0, 1, -1]
+        state["p1Units"][0] = [[13, 10, 65.0, "1"]]
+        state["p1Units"][6] = [[13, 10, 1.0, "3"]]
+        board.start_turn(state)
+        self.assertEqual(BoardDelta([[13, 10]], [], [], []), board.delta)
+        tracked = GameState(game.config, state, board=board)
+        parsed = GameState(game.config, state)
+        self.assertEqual(str(parsed.game_map[13, 10]), str(tracked.game_map[13, 10]))
+        self.assertEqual(parsed.game_map.get_structure_mask(), tracked.game_map.get_structure_mask())
+        tracked.game_map[13, 10][0].health = 1
+        self.assertEqual(65, board.units()[0].health)
+        self.assertTrue(board.units()[0].pending_removal)
+
+        frame["events"] = {"spawn": [], "damage": [[[13, 10], 20.0, 0, "1", 1]], "death": []}
+        board.apply_frame(json.dumps(frame))
+        state["p1Units"][0] = [[13, 10, 35.0, "1"]]
+        with self.assertRaises(AssertionError):
+            board.start_turn(state)
+        board.verify = False
+        board.start_turn(state)
+        self.assertEqual(35, board.units()[0].health)
+        self.assertEqual(BoardDelta([], [], [[13, 10]], []), board.delta)
+
+    def test_debug_log(self):
+        class Counted:
+            formatted = 0
+            def __str__(self):
+                Counted.formatted += 1
+                return "counted"
+
+        log = DebugLog(level=util.INFO, capacity=2)
+        log.debug("skipped {}", Counted())
+        log.info("first {}", Counted())
+        log.warning("second {}", Counted())
+        self.assertEqual(2, Counted.formatted, "Objects should be formatted when logged, and skipped messages not at all")
+        scored = [[13, 0]]
+        log.error("third {} {:.1f} {}", scored, 2.25, "plain")
+        scored.append([14, 0])
+        self.assertEqual(1, log.dropped)
+
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            log.flush()
+            written = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual("[WARNING] 1 older debug messages were dropped\n[WARNING] second counted\n[ERROR] third [[13, 0]] 2.2 plain\n", written)
+        self.assertEqual(2, Counted.formatted)
+        self.assertEqual(0, log.dropped)
+
+    def test_engine_io(self):
+        self.assertEqual({"a": [1, 2.5, "b"]}, util.json_loads(util.json_dumps({"a": (1, 2.5, "b")})))
+        self.assertEqual('[["FF",13,0]]', util.json_dumps([("FF", 13, 0)]))
+
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin = io.TextIOWrapper(io.BytesIO(b'{"turnInfo":[0,1,-1]}\n'))
+        sys.stdout = io.TextIOWrapper(io.BytesIO())
+        try:
+            self.assertEqual('{"turnInfo":[0,1,-1]}\n', util.get_command())
+            sys.stdout.write("printed\n")
+            util.send_command("[]", flush=False)
+            util.send_command("[1]")
+            sys.stdout.buffer.seek(0)
+            written = sys.stdout.buffer.read()
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        self.assertEqual(b"printed\n[]\n[1]\n", written)
+
+    def test_diagnostics(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(0, game.attempt_spawn("PI", [13, 5], 1000))
+        self.assertEqual(0, game.attempt_spawn("DF", [13, 20]))
+        game.game_map.get_edge_locations(7)
+        self.assertEqual(2, game.diagnostics.count("spawn_failed"))
+        self.assertEqual(3, game.diagnostics.count())
+        self.assertEqual(["Could not spawn PI at location [13, 5]. Information units must be deployed on the edge.",
+                          "Could not spawn DF at location [13, 20]. Location in enemy territory.",
+                          "Passed invalid quadrant_description '7'. See the documentation for valid inputs for get_edge_locations."],
+                         game.diagnostics.messages())
+        self.assertTrue(game.can_spawn("PI", [13, 0]))
+        self.assertFalse(game.can_spawn("PI", [13.5, 0]))
+
+    def test_unit_specs(self):
+        game = self.make_turn_0_map()
+        specs = compile_unit_specs(game.config)
+        self.assertIs(specs, compile_unit_specs(game.config))
+
+        turret = GameUnit("DF", game.config, 1, None, 13, 16)
+        other = GameUnit("DF", game.config, 0, 10, 13, 10)
+        self.assertIs(turret.spec, other.spec)
+        self.assertFalse(hasattr(turret, "__dict__"))
+        self.assertEqual([90, 90, 10], [turret.max_health, turret.health, other.health])
+        self.assertEqual([2, 0], turret.cost)
+
+        turret.upgrade()
+        self.assertTrue(turret.upgraded)
+        self.assertIs(specs["DF"].upgrade, turret.spec)
+        self.assertEqual(3.5, turret.attackRange)
+        self.assertEqual([6, 0], turret.cost)
+        self.assertEqual(other.attackRange, specs["DF"].attackRange)
+
+        copied = pickle.loads(pickle.dumps(turret))
+        self.assertEqual(str(turret), str(copied))
+        self.assertEqual(turret.attackRange, copied.attackRange)
+
+        turret.cost = [1, 1]
+        self.assertEqual([1, 1], copy.copy(turret).cost)
+        class TaggedUnit(GameUnit):
+            pass
+        tagged = TaggedUnit("FF", game.config, 0)
+        tagged.tag = "left"
+        copied = copy.copy(tagged)
+        self.assertIsInstance(copied, TaggedUnit)
+        self.assertEqual("left", copied.tag)
+
+        # only the last config is cached, so a new one doesn't keep the old one alive
+        compile_unit_specs(json.loads(json.dumps(game.config)))
+        self.assertIsNot(specs, compile_unit_specs(game.config))
+
+    def test_lazy_units(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Units"][0] = [[x, 12, 75.0, str(x)] for x in range(2, 26) if x != 13]
+        state["p1Units"][2] = [[13, 10, 60.0, "t"]]
+        state["p1Units"][3] = [[13, 0, 15.0, "s1"], [13, 0, 15.0, "s2"]]
+        state["p1Units"][5] = [[12, 12, 1.0, "r"]]
+        state["p1Units"][6] = [[10, 12, 1.0, "r2"]]
+        state["p1Units"].append([[13, 10, 1.0, "u"]])
+
+        class LazyState(GameState):
+            LAZY_UNITS = True
+        eager = GameState(game.config, state)
+        lazy = LazyState(game.config, state)
+        self.assertEqual(eager.game_map.get_structure_mask(0), lazy.game_map.get_structure_mask(0))
+        self.assertEqual(eager.find_path_to_edge([13, 0]), lazy.find_path_to_edge([13, 0]))
+        self.assertTrue(lazy.contains_stationary_unit([13, 10]).upgraded)
+        self.assertTrue(lazy.game_map[10, 12][0].pending_removal)
+        self.assertEqual("SI", lazy.game_map[12, 12][1].unit_type)
+        for x, y in lazy.game_map:
+            self.assertEqual(str(eager.game_map[x, y]), str(lazy.game_map[x, y]), [x, y])
+
+        # spawn checks, threat maps and path estimates read the raw structures
+        lazy = LazyState(game.config, state)
+        lazy.suppress_warnings(True)
+        raw = lazy.game_map._GameMap__raw
+        count = len(raw)
+        self.assertFalse(lazy.can_spawn("FF", [13, 10]))
+        self.assertFalse(lazy.can_spawn("PI", [13, 0]) and lazy.can_spawn("FF", [13, 0]))
+        self.assertEqual(1, lazy.attempt_remove([5, 12]))
+        self.assertEqual(eager.threat_map(1), lazy.threat_map(1))
+        path = eager.find_path_to_edge([14, 0])
+        self.assertEqual(eager.estimate_path_damage(path, "PI", 3), lazy.estimate_path_damage(path, "PI", 3))
+        self.assertEqual(count, len(raw), "A structure was turned into a GameUnit")
+
+        lazy = LazyState(game.config, state)
+        lazy.game_map.add_unit("PI", [13, 0])
+        tile = lazy.game_map[13, 0]
+        self.assertEqual(3, len(tile))
+        self.assertEqual([15, 15], [unit.health for unit in tile[:2]])
+
+    def test_unit_table(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p2Units"][0] = [[x, 16, 75.0, str(x)] for x in range(5, 9)]
+        state["p2Units"][2] = [[13, 20, 90.0, "t1"], [14, 24, 90.0, "t2"]]
+        state["p2Units"].append([[13, 20, 1.0, "u"]])
+        state["p1Units"][2] = [[13, 10, 60.0, "t3"]]
+        state["p1Units"][3] = [[13, 0, 15.0, "s1"]]
+
+        class LazyState(GameState):
+            LAZY_UNITS = True
+        for game_state in (GameState(game.config, state), LazyState(game.config, state)):
+            table = game_state.game_map.unit_table()
+            self.assertEqual(8, len(table))
+            self.assertEqual([15.0, 60.0], [float(health) for health in table.select(player_index=0).health])
+            turrets = table.select(player_index=1, unit_type="DF", y_range=(0, 21))
+            self.assertEqual([[13, 20]], turrets.locations())
+            self.assertTrue(bool(turrets.upgraded[0]))
+            self.assertEqual((2 + 4) + 2 + 4 * 1, table.select(player_index=1, stationary=True).total_cost())
+            self.assertEqual(0, len(table.select(stationary=True, unit_type="PI")))
+            if unit_table.np is not None:
+                self.assertIs(table.rows, table.health.base)
+
+    def test_fork(self):
+        def snapshot(game):
+            return (str([game.game_map[x, y] for x, y in game.game_map]), game.game_map.get_structure_mask(0),
+                    game.get_resources(), list(game._build_stack), list(game._deploy_stack),
+                    [list(column) for column in game.threat_map(1)])
+
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        game.attempt_spawn("DF", [[13, 10], [12, 10]])
+        game.attempt_spawn("PI", [13, 0])
+        before = snapshot(game)
+
+        child = game.fork()
+        self.assertIs(game.config, child.config)
+        self.assertEqual(before, snapshot(child))
+        self.assertIs(game.game_map[13, 10][0], child.game_map[13, 10][0])
+        child.attempt_upgrade([13, 10])
+        child.attempt_spawn("PI", [13, 0])
+        child.attempt_spawn("FF", [14, 10])
+        child.game_map.remove_unit([12, 10])
+        self.assertEqual(before, snapshot(game))
+        self.assertTrue(child.contains_stationary_unit([13, 10]).upgraded)
+        self.assertEqual(2, len(child.game_map[13, 0]))
+        self.assertIsNot(game.game_map[13, 10][0], child.game_map[13, 10][0])
+
+        grandchild = child.fork()
+        after = snapshot(child)
+        grandchild.attempt_remove([13, 10])
+        grandchild.game_map.add_unit("FF", [12, 10])
+        game.game_map.add_unit("FF", [15, 10])
+        self.assertEqual(after, snapshot(child))
+        self.assertFalse(grandchild.contains_stationary_unit([15, 10]))
+        self.assertEqual("FF", grandchild.contains_stationary_unit([12, 10]).unit_type)
+
+        class LazyState(GameState):
+            LAZY_UNITS = True
+        state = json.loads(game.serialized_string)
+        state["p1Units"][3] = [[13, 0, 15.0, "s1"]]
+        lazy = LazyState(game.config, state)
+        lazy_child = lazy.fork()
+        lazy_child.game_map.add_unit("PI", [13, 0])
+        self.assertEqual(2, len(lazy_child.game_map[13, 0]))
+        self.assertEqual(1, len(lazy.game_map[13, 0]))
+
+    def test_transaction(self):
+        def snapshot(game):
+            return (str([game.game_map[x, y] for x, y in game.game_map]), game.game_map.get_structure_mask(0),
+                    game.game_map.get_structure_mask(1), game.get_resources(), list(game._build_stack),
+                    list(game._deploy_stack), [list(column) for column in game.threat_map(1)])
+
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.attempt_spawn("DF", [[13, 10], [12, 10]])
+        game.attempt_spawn("PI", [13, 0])
+        before = snapshot(game)
+        turret = game.contains_stationary_unit([13, 10])
+
+        with game.transaction():
+            game.attempt_upgrade([13, 10])
+            game.attempt_spawn("PI", [13, 0], 2)
+            game.attempt_spawn("FF", [14, 10])
+            game.attempt_remove([12, 10])
+            game.game_map.remove_unit([12, 10])
+            game.game_map.add_unit("DF", [14, 16], 1)
+            self.assertNotEqual(before, snapshot(game))
+            child = game.fork()
+        self.assertEqual(before, snapshot(game))
+        self.assertIs(turret, game.contains_stationary_unit([13, 10]))
+        self.assertFalse(turret.upgraded)
+        self.assertTrue(child.contains_stationary_unit([13, 10]).upgraded)
+        self.assertIsNone(game._undo_log)
+
+        outer = game.savepoint()
+        game.attempt_spawn("FF", [14, 10])
+        inner = game.savepoint()
+        game.attempt_spawn("FF", [15, 10])
+        game.rollback(inner)
+        game.release(inner)
+        self.assertTrue(game.contains_stationary_unit([14, 10]))
+        self.assertFalse(game.contains_stationary_unit([15, 10]))
+        with game.transaction():
+            game.attempt_spawn("FF", [16, 10])
+        self.assertFalse(game.contains_stationary_unit([16, 10]))
+        game.rollback(outer)
+        game.release(outer)
+        self.assertEqual(before, snapshot(game))
+        self.assertIsNone(game._undo_log)
+
+        with game.transaction(commit=True):
+            game.attempt_spawn("FF", [14, 10])
+        self.assertTrue(game.contains_stationary_unit([14, 10]))
+        with self.assertRaises(KeyError):
+            with game.transaction(commit=True):
+                game.attempt_spawn("FF", [15, 10])
+                raise KeyError()
+        self.assertFalse(game.contains_stationary_unit([15, 10]))
@@ -1,3 +1,6 @@
+from collections import namedtuple
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,6 +12,55 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+UnitSpec = namedtuple("UnitSpec", ["unit_type", "config", "stationary", "speed", "damage_f", "damage_i", "attackRange",
+                                   "shieldRange", "max_health", "shieldPerUnit", "shieldBonusPerY", "cost", "upgrade"])
+UnitSpec.__doc__ = """The stats shared by every unit of one type, read from the config once
+
+    The fields are the GameUnit attributes of the same names, except that cost is a tuple.
+    upgrade is the UnitSpec of the upgraded type, or None if the type can't be upgraded or already is.
+"""
+
+_SPEC_KEYS = ["speed", "attackDamageTower", "attackDamageWalker", "attackRange", "shieldRange", "startHealth", "shieldPerUnit", "shieldBonusPerY"]
+# the last config compiled and its specs. Games use one config, so one entry is enough, and no old config is kept alive
+_compiled_specs = (None, None)
+
+def compile_unit_specs(config):
+    """Builds the UnitSpec of every unit type in a config
+
+    The result is cached for the config object, so this only reads the config the first time.
+    Only the last config is cached, so alternating between configs compiles them again. AlgoCore calls it when the game starts.
+
+    Args:
+        config (JSON): Contains information about the game
+
+    Returns:
+        A dict from unit type shorthand to its UnitSpec
+
+    """
+    global _compiled_specs
+    cached_config, cached_specs = _compiled_specs
+    if cached_config is config:
+        return cached_specs
+
+    specs = {}
+    for type_config in config["unitInformation"]:
+        unit_type = type_config.get("shorthand")
+        stationary = type_config.get("unitCategory") == 0
+        stats = [type_config.get(key, 0) for key in _SPEC_KEYS]
+        cost = (type_config.get("cost1", 0), type_config.get("cost2", 0))
+
+        upgrade = None
+        upgrade_config = type_config.get("upgrade")
+        if upgrade_config is not None:
+            upgraded_stats = [upgrade_config.get(key, value) for key, value in zip(_SPEC_KEYS, stats)]
+            upgraded_cost = (upgrade_config.get("cost1", 0) + cost[0], upgrade_config.get("cost2", 0) + cost[1])
+            upgrade = UnitSpec(unit_type, config, stationary, *upgraded_stats, upgraded_cost, None)
+        specs[unit_type] = UnitSpec(unit_type, config, stationary, *stats, cost, upgrade)
+
+    _compiled_specs = (config, specs)
+    return specs
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
@@ -30,8 +82,15 @@ class GameUnit:
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * spec (UnitSpec): The stats shared by all units of this type
+
+    The stats of each type are compiled once per config by compile_unit_specs, and copied into the unit's slots.
 
     """
+    __slots__ = ("unit_type", "config", "player_index", "x", "y", "health", "pending_removal", "upgraded", "spec",
+                 "stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange", "max_health",
+                 "shieldPerUnit", "shieldBonusPerY", "cost")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
@@ -43,36 +102,37 @@ class GameUnit:
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
+        self.__apply_spec(compile_unit_specs(config)[unit_type])
         self.health = self.max_health if not health else health
 
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+    def __apply_spec(self, spec):
+        # plain slots rather than properties, these are read in every hot loop
+        self.spec = spec
+        self.stationary = spec.stationary
+        self.speed = spec.speed
+        self.damage_f = spec.damage_f
+        self.damage_i = spec.damage_i
+        self.attackRange = spec.attackRange
+        self.shieldRange = spec.shieldRange
+        self.max_health = spec.max_health
+        self.shieldPerUnit = spec.shieldPerUnit
+        self.shieldBonusPerY = spec.shieldBonusPerY
+        self.cost = list(spec.cost)
 
+    def __copy__(self):
+        # copy.copy's generic path for slots is several times slower, and forks copy units one tile at a time
+        cls = type(self)
+        unit = cls.__new__(cls)
+        for name in GameUnit.__slots__:
+            setattr(unit, name, getattr(self, name))
+        unit.cost = list(self.cost)
+        if hasattr(self, "__dict__"):
+            unit.__dict__.update(self.__dict__)
+        return unit
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        if self.spec.upgrade is not None:
+            self.__apply_spec(self.spec.upgrade)
         self.upgraded = True
 
 
@@ -0,0 +1,132 @@
+from .unit import compile_unit_specs
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+FIELDS = ("x", "y", "type", "player_index", "health", "upgraded", "pending_removal", "cost_sp", "cost_mp")
+
+if np is not None:
+    ROW_DTYPE = np.dtype([("x", np.int8), ("y", np.int8), ("type", np.int8), ("player_index", np.int8),
+                          ("health", np.float64), ("upgraded", np.bool_), ("pending_removal", np.bool_),
+                          ("cost_sp", np.float64), ("cost_mp", np.float64)])
+
+
+def type_codes(config):
+    """Gets the integer code of every unit type, its index in the config's unitInformation
+
+    Returns:
+        A dict from unit type shorthand to its code, the same numbers the engine uses in turn messages
+
+    """
+    return {type_config.get("shorthand"): code for code, type_config in enumerate(config["unitInformation"])}
+
+
+class UnitTable:
+    """The units of a GameMap as columns, one row per unit
+
+    Get one with GameMap.unit_table(). Every column is an attribute named after its field: x, y, type
+    (the integer code of the unit type, see type_codes), player_index, health, upgraded, pending_removal,
+    and cost_sp and cost_mp, the resources spent on the unit including its upgrade.
+    With NumPy, the rows are one structured array and each column is a view of it, so reading a column copies nothing.
+    Without NumPy, the columns are lists.
+
+    The table is a snapshot: it doesn't follow later changes to the map or its units.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * codes (dict): Maps a unit type shorthand to its code
+        * rows: The structured array of the rows, or a list of row tuples without NumPy
+
+    """
+    def __init__(self, config, rows):
+        """Builds a table from row tuples ordered like FIELDS
+
+        Args:
+            config (JSON): Contains information about the game
+            rows: A list of row tuples, or an array with the ROW_DTYPE fields
+
+        """
+        self.config = config
+        self.codes = type_codes(config)
+        if np is not None and not isinstance(rows, np.ndarray):
+            rows = np.array(rows, dtype=ROW_DTYPE)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getattr__(self, name):
+        if name in FIELDS:
+            if np is not None:
+                return self.rows[name]
+            column = FIELDS.index(name)
+            return [row[column] for row in self.rows]
+        raise AttributeError(name)
+
+    def select(self, player_index=None, unit_type=None, stationary=None, x_range=None, y_range=None):
+        """Gets the rows that match every given filter
+
+        Args:
+            player_index: 0 for your units, 1 for the enemy's
+            unit_type: A unit type shorthand, or a list of them
+            stationary: True for structures only, False for mobile units only
+            x_range: A (low, high) pair, keeping rows with low <= x <= high
+            y_range: A (low, high) pair, keeping rows with low <= y <= high
+
+        Returns:
+            A new UnitTable with the matching rows
+
+        """
+        types = None
+        if unit_type is not None:
+            types = [unit_type] if isinstance(unit_type, str) else list(unit_type)
+        if stationary is not None:
+            specs = compile_unit_specs(self.config)
+            kept = [shorthand for shorthand in self.codes if specs[shorthand].stationary == stationary]
+            types = kept if types is None else [shorthand for shorthand in types if shorthand in kept]
+        codes = None if types is None else [self.codes[shorthand] for shorthand in types if shorthand in self.codes]
+
+        if np is None:
+            rows = [row for row in self.rows
+                    if (player_index is None or row[3] == player_index)
+                    and (codes is None or row[2] in codes)
+                    and (x_range is None or x_range[0] <= row[0] <= x_range[1])
+                    and (y_range is None or y_range[0] <= row[1] <= y_range[1])]
+            return UnitTable(self.config, rows)
+
+        rows = self.rows
+        keep = np.ones(len(rows), dtype=bool)
+        if player_index is not None:
+            keep &= rows["player_index"] == player_index
+        if codes is not None:
+            keep &= np.isin(rows["type"], codes)
+        if x_range is not None:
+            keep &= (rows["x"] >= x_range[0]) & (rows["x"] <= x_range[1])
+        if y_range is not None:
+            keep &= (rows["y"] >= y_range[0]) & (rows["y"] <= y_range[1])
+        return UnitTable(self.config, rows[keep])
+
+    def total_cost(self, resource_type=0):
+        """Sums what the units in the table cost
+
+        Args:
+            resource_type: SP (0) or MP (1), as in GameState
+
+        Returns:
+            The total cost as a float
+
+        """
+        column = "cost_sp" if resource_type == 0 else "cost_mp"
+        if np is None:
+            return float(sum(getattr(self, column)))
+        return float(self.rows[column].sum())
+
+    def locations(self):
+        """Lists the [x, y] location of every row, in order
+        """
+        if np is None:
+            return [[row[0], row[1]] for row in self.rows]
+        return [[int(x), int(y)] for x, y in zip(self.rows["x"], self.rows["y"])]
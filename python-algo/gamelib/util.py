@@ -1,33 +1,143 @@
 import sys
+import json
+import threading
+from collections import deque
+
+# Optional faster JSON backends, tried in order
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
 
+class EngineMessage(str):
+    """A message from the game engine, parsed once
+
+    It is the raw message string, so handlers that expect a string keep working,
+    and carries the parsed JSON so handlers that need the data don't parse it again.
+
+    Attributes :
+        * state (dict): The parsed message. It is shared, so treat it as read only.
+
+    """
+    def __new__(cls, message, state):
+        obj = super().__new__(cls, message)
+        obj.state = state
+        return obj
+
+
+def json_loads(text):
+    """Parses JSON with orjson or ujson when one is installed, otherwise with the json module
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    if ujson is not None:
+        return ujson.loads(text)
+    return json.loads(text)
+
+
+def json_dumps(obj):
+    """Serializes to a compact JSON string with orjson or ujson when one is installed, otherwise with the json module
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    if ujson is not None:
+        return ujson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def parse_message(message):
+    """Gets the parsed JSON of a message from the game engine
+
+    Args:
+        message: An EngineMessage, a JSON string or an already parsed dict
+
+    Returns:
+        The message as a dict, parsed only if it wasn't already
+
+    """
+    if isinstance(message, EngineMessage):
+        return message.state
+    if isinstance(message, dict):
+        return message
+    return json_loads(message)
+
+
+_DECODER = json.JSONDecoder()
+
+def decode_field(message, key):
+    """Decodes the value of one top level key of a message without parsing the rest of it
+
+    Args:
+        message: A JSON string from the game engine
+        key: A key that appears only once in the message, such as "turnInfo" or "events"
+
+    Returns:
+        The decoded value, or None if the key isn't in the message
+
+    """
+    start = message.find('"{}":'.format(key))
+    if start < 0:
+        return None
+    index = start + len(key) + 3
+    while message[index] in " \t\r\n":
+        index += 1
+    return _DECODER.raw_decode(message, index)[0]
+
+
 def get_command():
     """Gets input from stdin
 
+    The line is read from the binary buffer of stdin and decoded once, which avoids the text layer.
+
     """
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
     try:
-        ret = sys.stdin.readline()
+        ret = stdin.readline()
     except EOFError:
         # Game parent process terminated so exit
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
-    if ret == "":
+    if not ret:
         # Happens if parent game process dies, so exit for cleanup, 
         # Don't change or starter-algo process won't exit even though the game has closed
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
-    return ret
+    return ret.decode("utf-8") if isinstance(ret, bytes) else ret
 
-def send_command(cmd):
+_held_command = False
+
+def send_command(cmd, flush=True):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
 
+    The line is written to the binary buffer of stdout. Text already printed to sys.stdout is flushed ahead of it,
+    so it can't end up after the command.
+
+    Args:
+        cmd: The line to send
+        flush: If False, the line stays buffered until the next flushed command
+
     """
-    sys.stdout.write(cmd.strip() + "\n")
-    sys.stdout.flush()
+    global _held_command
+    stdout = getattr(sys.stdout, "buffer", None)
+    if stdout is None:
+        sys.stdout.write(cmd.strip() + "\n")
+    else:
+        # behind a held line, the text was flushed before it, and flushing now would write the held line on its own
+        if not _held_command:
+            sys.stdout.flush()
+        stdout.write(cmd.strip().encode("utf-8") + b"\n")
+    _held_command = not flush
+    if flush:
+        (sys.stdout if stdout is None else stdout).flush()
 
 def debug_write(*msg):
     """Prints a message to the games debug output
@@ -39,3 +149,92 @@ def debug_write(*msg):
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
+
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+# args of these types can't change after they are logged, so formatting them waits for the flush
+_PLAIN_TYPES = (int, float, str, bool, type(None))
+
+def _format(message, args):
+    try:
+        return message.format(*args) if args else str(message)
+    except Exception as e:
+        return "{} {} (could not format: {})".format(message, args, e)
+
+class DebugLog:
+    """A leveled debug log that keeps messages in memory and writes them to stderr in one go
+
+    Messages below level are dropped before they are formatted. Messages whose args are all plain numbers, strings,
+    bools or None are only formatted when flushed, so logging them in a hot loop costs a level check and a deque append.
+    Any other arg, like a list or a unit, could change before the flush, so those messages are formatted when logged.
+    Only the newest capacity messages are kept.
+    AlgoCore flushes the shared debug_log after every turn, and when the algo exits or crashes once start has been called.
+    It is safe to log from the precompute thread while the main thread logs or flushes.
+
+    Attributes :
+        * level (int): The lowest level that is recorded, one of DEBUG, INFO, WARNING and ERROR
+        * capacity (int): The number of messages kept between flushes
+        * dropped (int): The number of messages pushed out of the ring since the last flush
+
+    """
+    def __init__(self, level=INFO, capacity=1000):
+        self.level = level
+        self.capacity = capacity
+        self.dropped = 0
+        self._messages = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def enabled(self, level):
+        """Returns True if messages at level are recorded, to guard work that is only needed for logging
+        """
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Records a message, formatted with message.format(*args) when flushed, or now if an arg isn't a plain value
+
+        Args:
+            level: The level of the message
+            message: The message, with str.format fields for args
+            args: The values for the fields
+
+        """
+        if level >= self.level:
+            if args and not all(type(arg) in _PLAIN_TYPES for arg in args):
+                message, args = _format(message, args), ()
+            with self._lock:
+                if len(self._messages) == self.capacity:
+                    self.dropped += 1
+                self._messages.append((level, message, args))
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def flush(self):
+        """Formats the recorded messages and writes them to stderr with a single write
+        """
+        with self._lock:
+            if not self._messages and not self.dropped:
+                return
+            messages, dropped = list(self._messages), self.dropped
+            self._messages.clear()
+            self.dropped = 0
+        lines = []
+        if dropped:
+            lines.append("[WARNING] {} older debug messages were dropped".format(dropped))
+        for level, message, args in messages:
+            lines.append("[{}] {}".format(_LEVEL_NAMES.get(level, level), _format(message, args)))
+        sys.stderr.write("\n".join(lines) + "\n")
+        sys.stderr.flush()
+
+
+debug_log = DebugLog()
@@ -20,6 +20,10 @@ Advanced strategy tips:
 """
 
 class BaseStrategy(gamelib.AlgoCore):
+    # on_action_frame only reads breach events
+    ACTION_FRAME_EVENTS = ("breach",)
+    ACTION_FRAME_FIELDS = ("events",)
+
     def __init__(self):
         super().__init__()
         seed = random.randrange(maxsize)
@@ -183,25 +187,25 @@ class BaseStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
+        threat = game_state.threat_map(0)
         # Get the damage estimate each path will take
         for location in location_options:
             path = game_state.find_path_to_edge(location)
             damage = 0
-            for path_location in path:
-                # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+            for x, y in path:
+                # Sum the damage enemy turrets deal to each location on the path
+                damage += threat[x][y]
             damages.append(damage)
         
         # Now just return the location that takes the least damage
         return location_options[damages.index(min(damages))]
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
+        enemy_structures = game_state.game_map.unit_table().select(player_index=1, unit_type=unit_type, stationary=True)
         total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
+        for x, y in enemy_structures.locations():
+            if (valid_x is None or x in valid_x) and (valid_y is None or y in valid_y):
+                total_units += 1
         return total_units
         
     def filter_blocked_locations(self, locations, game_state):
@@ -219,7 +223,7 @@ class BaseStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
+        state = gamelib.parse_message(turn_string)
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
@@ -228,6 +232,6 @@ class BaseStrategy(gamelib.AlgoCore):
             # When parsing the frame data directly, 
             # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
             if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
+                gamelib.debug_log.info("Got scored on at: {}", location)
                 self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
\ No newline at end of file
+                gamelib.debug_log.debug("All locations: {}", self.scored_on_locations)
\ No newline at end of file
@@ -99,6 +99,10 @@ interceptor_plans = [
 ]
 
 class InterceptorStrategy(gamelib.AlgoCore):
+    # on_action_frame only reads spawn events
+    ACTION_FRAME_EVENTS = ("spawn",)
+    ACTION_FRAME_FIELDS = ("events",)
+
     def on_game_start(self, config):
         """ 
         Read in config and perform any initial setup here 
@@ -125,7 +129,7 @@ class InterceptorStrategy(gamelib.AlgoCore):
         game_state.submit_turn()
 
     def on_action_frame(self, turn_string):
-        state = json.loads(turn_string)
+        state = gamelib.parse_message(turn_string)
         spawns = state["events"]["spawn"]
         # # gamelib.debug_write(state)
         # # gamelib.debug_write(f"Spawns: {spawns}")
@@ -237,20 +241,29 @@ class InterceptorStrategy(gamelib.AlgoCore):
         #     attack_location = random.choice(attacker_locations)
         #     game_state.attempt_spawn(SCOUT, attack_location, num=1000)
 
-        struct_costs = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and unit.y < 22:
-                        struct_costs += unit.cost[0]
-        gamelib.debug_write("enemy structure points on board: {}".format(struct_costs))
+        enemy_structures = game_state.game_map.unit_table().select(player_index=1, stationary=True, y_range=(0, 21))
+        gamelib.debug_log.debug("enemy structure points on board: {}", enemy_structures.total_cost(game_state.SP))
 
         if game_state._player_resources[0]['MP'] >= 3:
             self.spawn_interceptors(game_state)
 
-        attack_location = random.choice(attacker_locations)
         if game_state._player_resources[0]['MP'] >= 7:
-            if struct_costs > 50: # attack with demolishers
-                game_state.attempt_spawn(DEMOLISHER, attack_location, num=1000)
-            else:
-                game_state.attempt_spawn(SCOUT, attack_location, num=1000)
\ No newline at end of file
+            attack_type, attack_location = self.choose_attack(game_state)
+            game_state.attempt_spawn(attack_type, attack_location, num=1000)
+
+    def choose_attack(self, game_state: gamelib.GameState) -> Tuple[str, List[int]]:
+        # simulate sending everything we can afford as scouts or demolishers from each attacker location
+        options = []
+        for attack_location in attacker_locations:
+            if game_state.contains_stationary_unit(attack_location):
+                continue
+            for unit_type in [SCOUT, DEMOLISHER]:
+                options.append((unit_type, attack_location, game_state.number_affordable(unit_type)))
+        if not options:
+            return SCOUT, random.choice(attacker_locations)
+
+        results = gamelib.BatchSimulator(game_state, [[option] for option in options]).run()
+        best = max(range(len(options)), key=lambda i: (results[i]["player_damage"], results[i]["structure_damage"]))
+        gamelib.debug_log.info("attack simulation: {} from {} breaches {} and deals {} structure damage",
+            options[best][0], options[best][1], results[best]["breaches"], results[best]["structure_damage"])
+        return options[best][0], options[best][1]
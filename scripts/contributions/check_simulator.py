@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Checks gamelib's ActionSimulator against the engine by replaying recorded action phases.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the scripts/contributions directory, next to python-algo.
+
+For every action phase in every replay, the state of frame 0 (structures plus the mobile units
+that were just spawned) is loaded into a GameState and simulated with gamelib's ActionSimulator.
+After each simulated frame, the simulation is compared with the recorded frame:
+	- mobile units, matched by id: existence, position and health
+	- structures, matched by location: existence and health
+	- breach events
+
+The first divergence of each replay is printed, followed by statistics over all replays.
+Only the first divergent frame of each action phase is counted by category, since everything
+after it has drifted anyway.
+
+Run it with a directory of replays:
+>py scripts/contributions/check_simulator.py replays
+
+Replays are checked in parallel, one process per cpu by default. Use -j to change this:
+>py scripts/contributions/check_simulator.py replays -j 4
+
+Use -v to print every divergent action phase instead of only the first one per replay.
+'''
+
+import sys
+try:
+	import os
+	import json
+	import glob
+	import argparse
+	import multiprocessing as mp
+	from collections import Counter
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'python-algo'))
+import gamelib
+
+MOBILE_INDICES = [3, 4, 5]
+STRUCTURE_INDICES = [0, 1, 2]
+HEALTH_TOLERANCE = 1e-6
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"directory",
+		help="directory holding the .replay files to check\n\n")
+	ap.add_argument(
+		"-j", "--jobs",
+		type=int,
+		default=mp.cpu_count(),
+		help="number of replays to check at one time\n\n")
+	ap.add_argument(
+		"-v", "--verbose",
+		action='store_true',
+		help="print every divergent action phase, not only the first one of each replay\n\n")
+	return vars(ap.parse_args())
+
+
+# same format as Replay.load_data in get_results.py
+def load_replay(fname):
+	config = None
+	frames = {}
+	with open(fname) as f:
+		for line in f:
+			line = line.replace("\n", "")
+			line = line.replace("\t", "")
+
+			if (line != ''):
+				data = json.loads(line)
+				if 'debug' in data:
+					config = data
+				else:
+					frames[(data['turnInfo'][1], data['turnInfo'][2])] = data
+	return config, frames
+
+
+# groups the action frames of each turn, in order
+def action_phases(frames):
+	phases = {}
+	for (turn, frame), data in frames.items():
+		if data['turnInfo'][0] == 1 and frame >= 0:
+			phases.setdefault(turn, {})[frame] = data
+	return [(turn, [phases[turn][frame] for frame in sorted(phases[turn])]) for turn in sorted(phases)]
+
+
+def unit_id(uid):
+	try:
+		return (0, int(uid))
+	except ValueError:
+		return (1, uid)
+
+
+def recorded_units(frame, indices):
+	units = {}
+	for key, player_index in (('p1Units', 0), ('p2Units', 1)):
+		for type_index in indices:
+			for x, y, hp, uid in (entry[:4] for entry in frame[key][type_index]):
+				units[uid] = (type_index, player_index, int(x), int(y), float(hp))
+	return units
+
+
+def recorded_breaches(frame):
+	return sorted((int(breach[0][0]), int(breach[0][1]), breach[4] - 1) for breach in frame['events']['breach'])
+
+
+def compare_frame(simulation, tracked, frame, breaches_seen):
+	mismatches = []
+
+	recorded = recorded_units(frame, MOBILE_INDICES)
+	on_board = set(id(unit) for unit in simulation.units if not unit.stationary)
+	simulated = {uid: unit for uid, unit in tracked.items() if id(unit) in on_board}
+	for uid in sorted(set(recorded) | set(simulated), key=unit_id):
+		if uid not in simulated:
+			mismatches.append(('missing unit', 'unit {} at {} is only in the replay'.format(uid, recorded[uid][2:4])))
+		elif uid not in recorded:
+			unit = simulated[uid]
+			mismatches.append(('extra unit', 'unit {} at {} is only in the simulation'.format(uid, [unit.x, unit.y])))
+		else:
+			unit = simulated[uid]
+			x, y, hp = recorded[uid][2:]
+			if [unit.x, unit.y] != [x, y]:
+				mismatches.append(('position', 'unit {} is at {} instead of {}'.format(uid, [unit.x, unit.y], [x, y])))
+			elif abs(unit.health - hp) > HEALTH_TOLERANCE:
+				mismatches.append(('health', 'unit {} has {} health instead of {}'.format(uid, unit.health, hp)))
+
+	recorded = {(x, y): hp for _, _, x, y, hp in recorded_units(frame, STRUCTURE_INDICES).values()}
+	simulated = {(unit.x, unit.y): unit.health for unit in simulation.units if unit.stationary}
+	for location in sorted(set(recorded) | set(simulated)):
+		if location not in simulated:
+			mismatches.append(('missing structure', 'structure at {} is only in the replay'.format(list(location))))
+		elif location not in recorded:
+			mismatches.append(('extra structure', 'structure at {} is only in the simulation'.format(list(location))))
+		elif abs(simulated[location] - recorded[location]) > HEALTH_TOLERANCE:
+			mismatches.append(('structure health', 'structure at {} has {} health instead of {}'.format(list(location), simulated[location], recorded[location])))
+
+	new_breaches = sorted((location[0], location[1], player_index) for location, _, _, player_index in simulation.breaches[breaches_seen:])
+	if new_breaches != recorded_breaches(frame):
+		mismatches.append(('breach', 'breaches {} instead of {}'.format(new_breaches, recorded_breaches(frame))))
+	return mismatches
+
+
+# simulates one action phase, returns the number of matching frames and the first divergence
+def check_phase(config, frames):
+	start = frames[0]
+	state = gamelib.GameState(config, json.dumps(start))
+	state.enable_warnings = False
+	state.game_map.enable_warnings = False
+	simulation = gamelib.ActionSimulator(state, include_deploy_stack=False)
+
+	tracked = {}
+	units = recorded_units(start, MOBILE_INDICES)
+	for uid in sorted(units, key=unit_id):
+		type_index, player_index, x, y, hp = units[uid]
+		unit = simulation.add_unit(config['unitInformation'][type_index]['shorthand'], [x, y], player_index)
+		# start from the recorded health, which can differ from the type's starting health
+		unit.health = hp
+		tracked[uid] = unit
+
+	matched = 0
+	try:
+		for frame in frames[1:]:
+			breaches_seen = len(simulation.breaches)
+			simulation.step()
+			mismatches = compare_frame(simulation, tracked, frame, breaches_seen)
+			if mismatches:
+				return matched, (frame['turnInfo'][2], mismatches)
+			matched += 1
+	finally:
+		simulation.close()
+	return matched, None
+
+
+def check_replay(fname):
+	result = {'file': fname, 'phases': 0, 'matching_phases': 0, 'frames': 0, 'matching_frames': 0, 'divergences': [], 'error': None}
+	try:
+		config, frames = load_replay(fname)
+		for turn, phase in action_phases(frames):
+			matched, divergence = check_phase(config, phase)
+			result['phases'] += 1
+			result['frames'] += len(phase) - 1
+			result['matching_frames'] += matched
+			if divergence is None:
+				result['matching_phases'] += 1
+			else:
+				result['divergences'].append((turn,) + divergence)
+	except Exception as e:
+		result['error'] = '{}: {}'.format(type(e).__name__, e)
+	return result
+
+
+def print_result(result, verbose):
+	name = os.path.basename(result['file'])
+	if result['error']:
+		print('{}: could not be checked ({})'.format(name, result['error']))
+		return
+	print('{}: {}/{} action phases match, {}/{} frames'.format(name, result['matching_phases'], result['phases'], result['matching_frames'], result['frames']))
+	for turn, frame, mismatches in result['divergences'][:None if verbose else 1]:
+		print('|      first divergence: turn {} frame {}'.format(turn, frame))
+		for category, detail in mismatches:
+			print('|      |      {:>18} : {}'.format(category, detail))
+
+
+def print_summary(results):
+	checked = [result for result in results if not result['error']]
+	categories = Counter()
+	for result in checked:
+		for turn, frame, mismatches in result['divergences']:
+			categories.update(set(category for category, _ in mismatches))
+
+	phases = sum(result['phases'] for result in checked)
+	frames = sum(result['frames'] for result in checked)
+	print('')
+	print('-----------------------------------------------------------------------------------')
+	print('Checked {} replays ({} could not be read)'.format(len(checked), len(results) - len(checked)))
+	print('Replays without divergence: {}'.format(len([result for result in checked if not result['divergences']])))
+	print('Action phases matching:     {}/{}'.format(sum(result['matching_phases'] for result in checked), phases))
+	print('Frames matching:            {}/{}'.format(sum(result['matching_frames'] for result in checked), frames))
+	if categories:
+		print('First divergences by category:')
+		for category, count in categories.most_common():
+			print('|      {:>18} : {}'.format(category, count))
+
+
+def main(args):
+	files = sorted(glob.glob(os.path.join(args['directory'], '*.replay')))
+	if not files:
+		print('No .replay files found in {}'.format(args['directory']))
+		return
+
+	results = []
+	with mp.Pool(max(1, args['jobs'])) as pool:
+		for result in pool.imap_unordered(check_replay, files, chunksize=4):
+			print_result(result, args['verbose'])
+			results.append(result)
+	print_summary(results)
+
+
+if __name__ == '__main__':
+	main(parse_args())